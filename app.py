@@ -36,7 +36,64 @@ logger = logging.getLogger(__name__)
 
 # Initialize bot and storage
 bot = Bot(token=Config.bot.BOT_TOKEN, parse_mode="HTML")
-storage = MemoryStorage()  # PythonAnywhere bepul tierda redis yo'q
+
+def _create_storage():
+    """
+    Creates the FSM storage backend.
+    Uses pooled RedisStorage2 when REDIS_HOST is configured (state survives
+    restarts and Redis ops share one connection pool); falls back to
+    MemoryStorage otherwise (PythonAnywhere bepul tierda redis yo'q).
+    """
+    if Config.database.REDIS_HOST:
+        try:
+            from aiogram.contrib.fsm_storage.redis import RedisStorage2, STATE_DATA_KEY
+
+            # FSM payloadlari uchun tezroq kodek: orjson o'rnatilgan bo'lsa
+            # ishlatiladi, aks holda stdlib json bilan ishlayveradi
+            try:
+                import orjson
+
+                def _fsm_dumps(data):
+                    return orjson.dumps(data).decode()
+
+                _fsm_loads = orjson.loads
+            except ImportError:
+                import json
+
+                _fsm_dumps = json.dumps
+                _fsm_loads = json.loads
+
+            class _FastJsonRedisStorage(RedisStorage2):
+                """RedisStorage2 with orjson-encoded FSM data payloads."""
+
+                async def get_data(self, *, chat=None, user=None, default=None):
+                    chat, user = self.check_address(chat=chat, user=user)
+                    key = self.generate_key(chat, user, STATE_DATA_KEY)
+                    raw_result = await self._redis.get(key)
+                    if raw_result:
+                        return _fsm_loads(raw_result)
+                    return default or {}
+
+                async def set_data(self, *, chat=None, user=None, data=None):
+                    chat, user = self.check_address(chat=chat, user=user)
+                    key = self.generate_key(chat, user, STATE_DATA_KEY)
+                    if data:
+                        await self._redis.set(key, _fsm_dumps(data), ex=self._data_ttl)
+                    else:
+                        await self._redis.delete(key)
+
+            logger.info(f"Using RedisStorage2 at {Config.database.REDIS_HOST}:{Config.database.REDIS_PORT}")
+            return _FastJsonRedisStorage(
+                host=Config.database.REDIS_HOST,
+                port=Config.database.REDIS_PORT,
+                db=Config.database.REDIS_DB,
+                pool_size=20,
+            )
+        except ImportError as e:
+            logger.warning(f"Redis client not installed, falling back to MemoryStorage: {e}")
+    return MemoryStorage()
+
+storage = _create_storage()
 dp = Dispatcher(bot, storage=storage)
 
 # Register handlers and filters
@@ -3,6 +3,8 @@ import datetime
 import json
 import logging
 import threading
+import time
+from functools import lru_cache
 from pathlib import Path
 from contextlib import contextmanager
 from typing import List, Dict, Optional, Any, Iterator
@@ -17,6 +19,27 @@ DB_FILE.parent.mkdir(parents=True, exist_ok=True)
 # Thread-safe connection lock
 _connection_lock = threading.Lock()
 
+# Per-user balance cache (TTL bilan) - bitta withdraw flow ichidagi takroriy
+# get_user_balance chaqiruvlarini DB ga bormasdan qaytarish uchun
+_BALANCE_CACHE_TTL = 5.0
+_BALANCE_CACHE_MAX = 4096  # Chegara - kesh foydalanuvchi soniga qarab cheksiz o'smasligi uchun
+_balance_cache: Dict[int, tuple] = {}
+
+def _invalidate_balance_cache(user_id: int) -> None:
+    """Drops the cached balance for a user after any balance write."""
+    _balance_cache.pop(user_id, None)
+
+def _balance_cache_put(user_id: int, balance: float) -> None:
+    """Caches one balance, sweeping expired then oldest entries past the cap."""
+    now = time.monotonic()
+    if len(_balance_cache) >= _BALANCE_CACHE_MAX:
+        for uid, (ts, _) in list(_balance_cache.items()):
+            if now - ts >= _BALANCE_CACHE_TTL:
+                del _balance_cache[uid]
+        while len(_balance_cache) >= _BALANCE_CACHE_MAX:
+            _balance_cache.pop(next(iter(_balance_cache)))
+    _balance_cache[user_id] = (now, balance)
+
 @contextmanager
 def get_connection() -> Iterator[sqlite3.Connection]:
     """
@@ -24,7 +47,6 @@ def get_connection() -> Iterator[sqlite3.Connection]:
     Yields:
         SQLite connection object.
     """
-    import time
     max_retries = 3
     retry_delay = 0.1
     
@@ -192,6 +214,13 @@ def run_migrations() -> None:
     logger.info("Database migrations completed")
 
 # -------- SETTINGS --------
+# Sozlamalar versiyasi: har o'zgarishda oshadi, klaviatura keshlari shu raqamga bog'lanadi
+_settings_version = 0
+
+def get_settings_version() -> int:
+    """Returns a counter incremented on every settings change (used as a cache key)."""
+    return _settings_version
+
 def set_setting(key: str, value: Any) -> None:
     """
     Sets or updates a setting in the settings table.
@@ -199,6 +228,7 @@ def set_setting(key: str, value: Any) -> None:
         key: Setting key.
         value: Setting value (auto-converted to JSON string if not str).
     """
+    global _settings_version
     value = json.dumps(value) if not isinstance(value, str) else value
     with get_connection() as conn:
         cur = conn.cursor()
@@ -208,6 +238,7 @@ def set_setting(key: str, value: Any) -> None:
             ON CONFLICT(key) DO UPDATE SET value = excluded.value
         """, (key, value))
         conn.commit()
+        _settings_version += 1
         logger.debug(f"Setting updated: {key} = {value}")
 
 def update_setting(key: str, value: str) -> None:
@@ -234,6 +265,37 @@ def get_setting(key: str, default: Any = None) -> Any:
                 return row[0]
         return default
 
+def get_all_settings() -> Dict[str, Any]:
+    """
+    Retrieves the whole settings table in one query.
+    Returns:
+        Dictionary mapping setting key to parsed value.
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT key, value FROM settings")
+        rows = cur.fetchall()
+    settings: Dict[str, Any] = {}
+    for row in rows:
+        try:
+            settings[row["key"]] = json.loads(row["value"])
+        except (json.JSONDecodeError, TypeError):
+            settings[row["key"]] = row["value"]
+    return settings
+
+@lru_cache(maxsize=1)
+def _settings_snapshot(version: int) -> Dict[str, Any]:
+    """Caches one settings snapshot per settings version."""
+    return get_all_settings()
+
+def get_settings_snapshot() -> Dict[str, Any]:
+    """
+    Returns all settings as a cached dict.
+    The cache key is the settings version, so the snapshot refreshes
+    automatically after set_setting and costs one query per change.
+    """
+    return _settings_snapshot(_settings_version)
+
 # -------- TUTORIAL STEPS --------
 def get_tutorial_steps() -> List[Dict]:
     """
@@ -316,6 +378,23 @@ def get_user(user_id: int) -> Optional[Dict]:
         user = cur.fetchone()
         return dict(user) if user else None
 
+def get_users_bulk(user_ids: List[int]) -> Dict[int, Dict]:
+    """
+    Retrieves several users in a single query.
+    Args:
+        user_ids: List of Telegram user IDs.
+    Returns:
+        Dictionary mapping user_id to the user dictionary (missing IDs are omitted).
+    """
+    if not user_ids:
+        return {}
+    placeholders = ",".join("?" * len(user_ids))
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT * FROM users WHERE user_id IN ({placeholders})", tuple(user_ids))
+        rows = cur.fetchall()
+        return {row["user_id"]: dict(row) for row in rows}
+
 def get_user_by_id(user_id: int) -> Optional[Dict]:
     """Alias for get_user (for compatibility)."""
     return get_user(user_id)
@@ -328,11 +407,16 @@ def get_user_balance(user_id: int) -> float:
     Returns:
         User's balance in so'm.
     """
+    cached = _balance_cache.get(user_id)
+    if cached and time.monotonic() - cached[0] < _BALANCE_CACHE_TTL:
+        return cached[1]
     with get_connection() as conn:
         cur = conn.cursor()
         cur.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,))
         row = cur.fetchone()
-        return float(row[0]) if row else 0.0
+        balance = float(row[0]) if row else 0.0
+        _balance_cache_put(user_id, balance)
+        return balance
 
 def update_user_balance(user_id: int, delta: float) -> None:
     """
@@ -355,6 +439,7 @@ def update_user_balance(user_id: int, delta: float) -> None:
             new_balance = max(0.0, current + delta)  # Balans salbiy bo'lmasligi uchun
             cur.execute("UPDATE users SET balance = ? WHERE user_id = ?", (new_balance, user_id))
             conn.commit()
+            _invalidate_balance_cache(user_id)
             logger.debug(f"Balance updated for user {user_id}: {current} -> {new_balance}")
         except sqlite3.Error as e:
             conn.rollback()
@@ -457,20 +542,42 @@ def create_order(user_id: int, product_url: str, photo_id: str) -> int:
         logger.debug(f"Order created: id={order_id}, user_id={user_id}")
         return order_id
 
-def get_user_orders(user_id: int) -> List[Dict]:
+def get_user_orders(user_id: int, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
     """
-    Retrieves all orders for a user.
+    Retrieves orders for a user, optionally one page at a time.
     Args:
         user_id: Telegram user ID.
+        limit: Maximum number of orders to return (None for all).
+        offset: Number of orders to skip (for pagination).
     Returns:
         List of order dictionaries.
     """
     with get_connection() as conn:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM orders WHERE user_id = ? ORDER BY created_at DESC", (user_id,))
+        if limit is not None:
+            cur.execute(
+                "SELECT * FROM orders WHERE user_id = ? ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (user_id, limit, offset)
+            )
+        else:
+            cur.execute("SELECT * FROM orders WHERE user_id = ? ORDER BY created_at DESC", (user_id,))
         rows = cur.fetchall()
         return [dict(r) for r in rows]
 
+def get_user_orders_count(user_id: int) -> int:
+    """
+    Counts the total number of orders for a user.
+    Args:
+        user_id: Telegram user ID.
+    Returns:
+        Number of orders.
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM orders WHERE user_id = ?", (user_id,))
+        row = cur.fetchone()
+        return row[0] if row else 0
+
 def get_all_orders(start_date: Optional[datetime.date] = None, end_date: Optional[datetime.date] = None, user_id: Optional[int] = None) -> List[Dict]:
     """
     Retrieves all orders with optional filters.
@@ -505,6 +612,62 @@ def get_all_orders(start_date: Optional[datetime.date] = None, end_date: Optiona
         rows = cur.fetchall()
         return [dict(r) for r in rows]
 
+def get_all_orders_iter(
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+    user_id: Optional[int] = None,
+    chunk_size: int = 10_000,
+):
+    """
+    Yields orders in chunks instead of materializing the full result list.
+    Uses the same filters as get_all_orders; meant for large exports where
+    holding every row in memory at once is wasteful. Har bo'lak oxirgi id
+    bo'yicha alohida keyset so'rovi bilan olinadi - ulanish bo'laklar orasida
+    ochiq turmaydi, eksport davomida qo'shilgan/o'chirilgan zakazlar keyingi
+    bo'laklarni siljitmaydi va OFFSET kabi qator sanab o'tilmaydi.
+    Args:
+        start_date: Filter orders after this date (optional).
+        end_date: Filter orders before this date (optional).
+        user_id: Filter orders by user ID (optional).
+        chunk_size: Number of rows fetched per batch.
+    Yields:
+        Lists of order dictionaries, chunk_size rows at a time.
+    """
+    query = """
+        SELECT o.*, u.username
+        FROM orders o
+        LEFT JOIN users u ON o.user_id = u.user_id
+        WHERE 1=1
+    """
+    params = []
+    if user_id:
+        query += " AND o.user_id = ?"
+        params.append(user_id)
+    if start_date:
+        query += " AND DATE(o.created_at) >= ?"
+        params.append(start_date.strftime("%Y-%m-%d"))
+    if end_date:
+        query += " AND DATE(o.created_at) <= ?"
+        params.append(end_date.strftime("%Y-%m-%d"))
+    last_id = None
+    while True:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            if last_id is None:
+                cur.execute(query + " ORDER BY o.id DESC LIMIT ?", params + [chunk_size])
+            else:
+                cur.execute(
+                    query + " AND o.id < ? ORDER BY o.id DESC LIMIT ?",
+                    params + [last_id, chunk_size],
+                )
+            rows = cur.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        yield [dict(r) for r in rows]
+        if len(rows) < chunk_size:
+            break
+
 def cancel_order(user_id: int, order_id: int) -> None:
     """
     Cancels an order.
@@ -542,6 +705,7 @@ def add_user_balance(user_id: int, amount: float) -> None:
         cur = conn.cursor()
         cur.execute("UPDATE users SET balance = balance + ? WHERE user_id = ?", (amount, user_id))
         conn.commit()
+        _invalidate_balance_cache(user_id)
         logger.debug(f"Added {amount} to user {user_id} balance")
 
 def get_pending_withdraw_requests() -> list:
@@ -606,8 +770,9 @@ def reject_withdraw_request_and_refund(request_id: int) -> None:
             current_balance = float(balance_row[0])
             new_balance = current_balance + amount
             cur.execute("UPDATE users SET balance = ? WHERE user_id = ?", (new_balance, user_id))
-            
+
             conn.commit()
+            _invalidate_balance_cache(user_id)
             logger.debug(f"Withdraw request {request_id} rejected and {amount} refunded to user {user_id}, balance: {current_balance} -> {new_balance}")
         except (sqlite3.Error, ValueError) as e:
             conn.rollback()
@@ -650,8 +815,9 @@ def create_withdraw_request(user_id: int, amount: float, wallet: str, withdraw_t
             # Balansni yangilash - bir xil connection ichida
             new_balance = max(0.0, current_balance - amount)
             cur.execute("UPDATE users SET balance = ? WHERE user_id = ?", (new_balance, user_id))
-            
+
             conn.commit()
+            _invalidate_balance_cache(user_id)
             logger.debug(f"Withdraw request created: id={withdraw_id}, user_id={user_id}, amount={amount}, type={withdraw_type}, balance: {current_balance} -> {new_balance}")
             return withdraw_id
         except (sqlite3.Error, ValueError) as e:
@@ -779,11 +945,19 @@ def get_user_referrals(user_id: int) -> List[Dict]:
     Args:
         user_id: Referrer's user ID.
     Returns:
-        List of referral dictionaries.
+        List of referral dictionaries, each including the referred user's
+        username as 'referred_username' (single JOIN instead of per-row lookups).
     """
     with get_connection() as conn:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM referrals WHERE referrer_id = ? ORDER BY created_at DESC", (user_id,))
+        cur.execute(
+            """SELECT r.*, u.username AS referred_username
+               FROM referrals r
+               LEFT JOIN users u ON u.user_id = r.referred_id
+               WHERE r.referrer_id = ?
+               ORDER BY r.created_at DESC""",
+            (user_id,)
+        )
         rows = cur.fetchall()
         return [dict(r) for r in rows]
 
@@ -818,6 +992,23 @@ def get_all_referrals(start_date: Optional[datetime.date] = None, end_date: Opti
         rows = cur.fetchall()
         return [dict(r) for r in rows]
 
+def get_referral_stats(user_id: int) -> tuple:
+    """
+    Retrieves referral count and total bonus for a user in a single query.
+    Args:
+        user_id: Referrer's user ID.
+    Returns:
+        Tuple of (referral count, total bonus).
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT COUNT(*), COALESCE(SUM(bonus), 0) FROM referrals WHERE referrer_id = ?",
+            (user_id,)
+        )
+        row = cur.fetchone()
+        return (row[0], float(row[1])) if row else (0, 0.0)
+
 def get_referrals_count(user_id: int) -> int:
     """
     Counts the number of referrals for a user.
@@ -955,6 +1146,26 @@ def insert_support_message(user_id: int, support_id: str, text: str, file_id: Op
         conn.commit()
         logger.debug(f"Support message saved: support_id={support_id}, user_id={user_id}")
 
+def bulk_insert_support_messages(messages: List[tuple]) -> None:
+    """
+    Inserts several support messages in one transaction.
+    Args:
+        messages: List of (support_id, user_id, text, file_id, file_type) tuples.
+    """
+    if not messages:
+        return
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.executemany(
+            """
+            INSERT INTO support_messages (support_id, user_id, text, file_id, file_type)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            messages
+        )
+        conn.commit()
+        logger.debug(f"Support messages saved in bulk: {len(messages)} rows")
+
 def update_support_reply(support_id: str, reply_text: str) -> None:
     """
     Updates support message with admin reply.
@@ -7,7 +7,7 @@ from aiogram.dispatcher.filters import Command, Text, Regexp
 from aiogram.dispatcher.filters.state import State, StatesGroup
 from aiogram.utils.exceptions import BotBlocked, UserDeactivated
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardRemove
-from utils.filters import IsPrivateCallback, IsNotBlockedCallback, IsAdminCallback
+from utils.filters import IsPrivateCallback, IsNotBlockedCallback, IsAdminCallback, CallbackPrefixFilter, invalidate_user_filters
 
 from database import (
     get_all_users,
@@ -31,7 +31,7 @@ from database import (
     update_withdraw_request_status,
     reject_withdraw_request_and_refund
 )
-from utils.excel_export import export_orders_excel, export_users_excel
+from utils.excel_export import export_orders_excel_async, export_users_excel_async
 from keyboards.admin_keyboards import (
     admin_main_menu_kb,
     broadcast_inline_kb,
@@ -97,9 +97,9 @@ async def show_stats(message: types.Message):
 async def export_excel(message: types.Message):
     """Exports orders to Excel."""
     try:
-        file_path = export_orders_excel()
+        file_path = await export_orders_excel_async(admin_id=message.from_user.id)
         await message.answer_document(
-            types.FSInputFile(file_path),
+            types.InputFile(file_path),
             caption="📂 Bugungi zakazlar ro‘yxati (Excel formatda).",
             reply_markup=admin_main_menu_kb()
         )
@@ -331,6 +331,7 @@ async def block_user_cb(callback: types.CallbackQuery):
     """Blocks a user."""
     user_id = int(callback.data.split("_")[1])
     block_user(user_id)
+    invalidate_user_filters(user_id)  # Kesh yangi holatni darhol ko'rsin
     await callback.message.edit_text(f"🚫 Foydalanuvchi {user_id} bloklandi.", reply_markup=admin_main_menu_kb())
     await callback.answer()
 
@@ -338,6 +339,7 @@ async def unblock_user_cb(callback: types.CallbackQuery):
     """Unblocks a user."""
     user_id = int(callback.data.split("_")[1])
     unblock_user(user_id)
+    invalidate_user_filters(user_id)
     await callback.message.edit_text(f"✅ Foydalanuvchi {user_id} blokdan chiqarildi.", reply_markup=admin_main_menu_kb())
     await callback.answer()
 
@@ -760,11 +762,8 @@ async def show_users_list_direct(callback: types.CallbackQuery, users: list, tit
 
 async def handle_user_pagination(callback: types.CallbackQuery):
     """Handles user pagination."""
-    data = callback.data.split("_")
-    action = data[0] + "_" + data[1]  # all_users, today_users, etc.
-    page = int(data[3])
-    
-    if action == "all_users":
+    if callback.data.startswith("all_users_page_"):
+        page = int(callback.data.removeprefix("all_users_page_"))
         users = get_all_users_detailed()
         total_pages = (len(users) + 9) // 10
         await show_users_page(callback, users, page, total_pages, "all_users")
@@ -785,7 +784,7 @@ async def export_users_excel_handler(callback: types.CallbackQuery):
     try:
         await callback.answer("📤 Foydalanuvchilar Excel faylga export qilinmoqda...")
         
-        file_path = export_users_excel(
+        file_path = await export_users_excel_async(
             admin_id=callback.from_user.id,
             file_format="xlsx"
         )
@@ -814,8 +813,8 @@ def register_handlers(dp: Dispatcher):
     dp.register_message_handler(start_broadcast, Text(equals="📨 Xabar yuborish"), state="*")
     dp.register_callback_query_handler(broadcast_all_start, lambda c: c.data == "broadcast_all", IsPrivateCallback(), IsAdminCallback(), state="*")
     dp.register_message_handler(process_broadcast_text, content_types=['text', 'photo', 'video'], state=AdminStates.waiting_for_broadcast_text)
-    dp.register_callback_query_handler(preview_broadcast, lambda c: c.data.startswith("preview_broadcast_"), IsPrivateCallback(), IsAdminCallback(), state="*")
-    dp.register_callback_query_handler(send_broadcast, lambda c: c.data.startswith("send_broadcast_"), IsPrivateCallback(), IsAdminCallback(), state="*")
+    dp.register_callback_query_handler(preview_broadcast, CallbackPrefixFilter("preview_broadcast_"), IsPrivateCallback(), IsAdminCallback(), state="*")
+    dp.register_callback_query_handler(send_broadcast, CallbackPrefixFilter("send_broadcast_"), IsPrivateCallback(), IsAdminCallback(), state="*")
     dp.register_callback_query_handler(cancel_broadcast, lambda c: c.data == "cancel_broadcast", IsPrivateCallback(), IsAdminCallback(), state="*")
     dp.register_callback_query_handler(edit_broadcast, lambda c: c.data == "edit_broadcast", IsPrivateCallback(), IsAdminCallback(), state="*")
     dp.register_callback_query_handler(ask_user_id, lambda c: c.data == "broadcast_one", IsPrivateCallback(), IsAdminCallback(), state="*")
@@ -823,28 +822,28 @@ def register_handlers(dp: Dispatcher):
     dp.register_message_handler(send_single_message, state=AdminStates.waiting_for_single_message)
     dp.register_message_handler(ask_user_for_manage, Text(equals="👤 Foydalanuvchi boshqaruvi"), state="*")
     dp.register_message_handler(manage_user, Regexp(r"^\d+$"), state=AdminStates.waiting_for_user_details)
-    dp.register_callback_query_handler(block_user_cb, lambda c: c.data.startswith("block_"), IsPrivateCallback(), IsAdminCallback(), state="*")
-    dp.register_callback_query_handler(unblock_user_cb, lambda c: c.data.startswith("unblock_"), IsPrivateCallback(), IsAdminCallback(), state="*")
-    dp.register_callback_query_handler(ask_user_id, lambda c: c.data.startswith("send_message_"), IsPrivateCallback(), IsAdminCallback(), state="*")
+    dp.register_callback_query_handler(block_user_cb, CallbackPrefixFilter("block_"), IsPrivateCallback(), IsAdminCallback(), state="*")
+    dp.register_callback_query_handler(unblock_user_cb, CallbackPrefixFilter("unblock_"), IsPrivateCallback(), IsAdminCallback(), state="*")
+    dp.register_callback_query_handler(ask_user_id, CallbackPrefixFilter("send_message_"), IsPrivateCallback(), IsAdminCallback(), state="*")
     dp.register_message_handler(edit_ad_text, Text(equals="📝 Reklama matnini o‘zgartirish"), state="*")
     dp.register_callback_query_handler(wait_new_ad_text, lambda c: c.data == "edit_ad_text", IsPrivateCallback(), IsAdminCallback(), state="*")
     dp.register_message_handler(save_new_ad_text, state=AdminStates.waiting_for_new_ad_text)
     dp.register_message_handler(ask_video_upload, Text(equals="📹 Qo'llanma video yuklash"), state="*")
     dp.register_message_handler(save_guide_video, content_types=types.ContentType.VIDEO, state=AdminStates.waiting_for_video_upload)
     dp.register_message_handler(manage_orders, Text(equals="📦 Zakazlarni boshqarish"), state="*")
-    dp.register_callback_query_handler(view_order, lambda c: c.data.startswith("view_order_"), IsPrivateCallback(), IsAdminCallback(), state="*")
-    dp.register_callback_query_handler(approve_order, lambda c: c.data.startswith("approve_order_"), IsPrivateCallback(), IsAdminCallback(), state="*")
-    dp.register_callback_query_handler(reject_order, lambda c: c.data.startswith("reject_order_"), IsPrivateCallback(), IsAdminCallback(), state="*")
+    dp.register_callback_query_handler(view_order, CallbackPrefixFilter("view_order_"), IsPrivateCallback(), IsAdminCallback(), state="*")
+    dp.register_callback_query_handler(approve_order, CallbackPrefixFilter("approve_order_"), IsPrivateCallback(), IsAdminCallback(), state="*")
+    dp.register_callback_query_handler(reject_order, CallbackPrefixFilter("reject_order_"), IsPrivateCallback(), IsAdminCallback(), state="*")
     dp.register_callback_query_handler(back_to_orders, lambda c: c.data == "back_to_orders", IsPrivateCallback(), IsAdminCallback(), state="*")
     dp.register_message_handler(manage_withdraw_requests, Text(equals="💸 Pul yechib olish so'rovlari"), state="*")
-    dp.register_callback_query_handler(view_withdraw_request, lambda c: c.data.startswith("view_withdraw_"), IsPrivateCallback(), IsAdminCallback(), state="*")
-    dp.register_callback_query_handler(process_payment, lambda c: c.data.startswith("process_payment_"), IsPrivateCallback(), IsAdminCallback(), state="*")
-    dp.register_callback_query_handler(reject_withdraw_request, lambda c: c.data.startswith("reject_withdraw_"), IsPrivateCallback(), IsAdminCallback(), state="*")
+    dp.register_callback_query_handler(view_withdraw_request, CallbackPrefixFilter("view_withdraw_"), IsPrivateCallback(), IsAdminCallback(), state="*")
+    dp.register_callback_query_handler(process_payment, CallbackPrefixFilter("process_payment_"), IsPrivateCallback(), IsAdminCallback(), state="*")
+    dp.register_callback_query_handler(reject_withdraw_request, CallbackPrefixFilter("reject_withdraw_"), IsPrivateCallback(), IsAdminCallback(), state="*")
     dp.register_callback_query_handler(back_to_withdraws, lambda c: c.data == "back_to_withdraws", IsPrivateCallback(), IsAdminCallback(), state="*")
     dp.register_message_handler(show_users_list, Text(equals="👥 Foydalanuvchilar ro'yxati"), state="*")
     dp.register_callback_query_handler(view_all_users, lambda c: c.data == "view_all_users", IsPrivateCallback(), IsAdminCallback(), state="*")
     dp.register_callback_query_handler(view_today_users, lambda c: c.data == "view_today_users", IsPrivateCallback(), IsAdminCallback(), state="*")
     dp.register_callback_query_handler(view_active_users, lambda c: c.data == "view_active_users", IsPrivateCallback(), IsAdminCallback(), state="*")
-    dp.register_callback_query_handler(handle_user_pagination, lambda c: c.data.startswith("all_users_page_"), IsPrivateCallback(), IsAdminCallback(), state="*")
+    dp.register_callback_query_handler(handle_user_pagination, CallbackPrefixFilter("all_users_page_"), IsPrivateCallback(), IsAdminCallback(), state="*")
     dp.register_callback_query_handler(back_to_users_menu, lambda c: c.data == "back_to_users_menu", IsPrivateCallback(), IsAdminCallback(), state="*")
     dp.register_callback_query_handler(export_users_excel_handler, lambda c: c.data == "export_users_excel", IsPrivateCallback(), IsAdminCallback(), state="*")
\ No newline at end of file
@@ -9,7 +9,7 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeybo
 from database import (
     get_user_balance,
     create_withdraw_request,
-    get_user_referrals,
+    get_referral_stats,
     get_pending_withdraws,
     update_user_balance,
     set_withdraw_status,
@@ -18,7 +18,8 @@ from database import (
 )
 from keyboards.user_keyboards import payment_menu_kb, make_main_menu_inline
 from keyboards.admin_keyboards import withdraw_manage_inline_kb
-from utils.filters import IsPrivateCallback, IsNotBlockedCallback, IsAdminCallback, IsAdmin
+from utils.filters import IsPrivateCallback, IsNotBlockedCallback, IsAdminCallback, IsAdmin, CallbackPrefixFilter
+from utils.outbound import outbound
 from config import Config
 
 logger = logging.getLogger(__name__)
@@ -50,12 +51,11 @@ async def show_balance(message: types.Message):
     try:
         user_id = message.from_user.id
         balance = get_user_balance(user_id)
-        referrals = get_user_referrals(user_id)
-        total_bonus = sum(ref['bonus'] for ref in referrals)
+        referral_count, total_bonus = get_referral_stats(user_id)
 
         text = (
             f"<b>💰 Sizning balansingiz:</b> {balance:.2f} so'm\n"
-            f"<b>👥 Referallaringiz:</b> {len(referrals)} ta\n"
+            f"<b>👥 Referallaringiz:</b> {referral_count} ta\n"
             f"<b>💸 Referral bonusi:</b> {total_bonus:.2f} so'm\n\n"
             "Menyudan kerakli amalni tanlang 👇"
         )
@@ -91,7 +91,7 @@ async def ask_withdraw_type(message: types.Message, state: FSMContext):
 async def process_withdraw_type(callback: types.CallbackQuery, state: FSMContext):
     """Processes the selected withdrawal type."""
     await callback.answer()
-    withdraw_type = callback.data.split("_")[1]
+    withdraw_type = callback.data.removeprefix("withdraw_")
     await state.update_data(withdraw_type=withdraw_type)
 
     user = get_user(callback.from_user.id)
@@ -202,15 +202,9 @@ async def save_withdraw_request(message: types.Message, state: FSMContext):
             f"{withdraw_type_emoji}: {display_wallet}\n"
             f"📞 Telefon: {user.get('phone', 'Yoq')}"
         )
-        try:
-            await message.bot.send_message(
-                admin_chat,
-                text,
-                parse_mode="HTML",
-                reply_markup=withdraw_manage_inline_kb(withdraw_id)
-            )
-        except Exception as e:
-            logger.exception(f"Admin notification for withdraw {withdraw_id} failed: {e}")
+        # Umumiy navbat orqali: bitta token bucket, bitta chatga tartibli yuborish
+        outbound.enqueue(message.bot, admin_chat, text, parse_mode="HTML",
+                         reply_markup=withdraw_manage_inline_kb(withdraw_id))
         await state.finish()
     except ValueError as e:
         if "Insufficient balance" in str(e):
@@ -236,7 +230,7 @@ async def save_withdraw_request(message: types.Message, state: FSMContext):
 async def confirm_phone(callback: types.CallbackQuery, state: FSMContext):
     """Confirms the existing phone number for withdrawal."""
     await callback.answer()
-    phone = callback.data.split("_")[-1]
+    phone = callback.data.removeprefix("confirm_phone_")
     await state.update_data(wallet=phone)
     await save_withdraw_request_from_callback(callback, state, phone)
 
@@ -275,15 +269,9 @@ async def save_withdraw_request_from_callback(callback: types.CallbackQuery, sta
             f"{withdraw_type_emoji}: {display_wallet}\n"
             f"📞 Telefon: {user.get('phone', 'Yoq')}"
         )
-        try:
-            await callback.bot.send_message(
-                admin_chat,
-                text,
-                parse_mode="HTML",
-                reply_markup=withdraw_manage_inline_kb(withdraw_id)
-            )
-        except Exception as e:
-            logger.exception(f"Admin notification for withdraw {withdraw_id} failed: {e}")
+        # Umumiy navbat orqali: bitta token bucket, bitta chatga tartibli yuborish
+        outbound.enqueue(callback.bot, admin_chat, text, parse_mode="HTML",
+                         reply_markup=withdraw_manage_inline_kb(withdraw_id))
         await state.finish()
     except Exception as e:
         logger.exception(f"save_withdraw_request_from_callback failed for user {callback.from_user.id}: {e}")
@@ -373,7 +361,7 @@ async def admin_withdraw_panel(message: types.Message):
 async def accept_withdraw(callback: types.CallbackQuery):
     """Approves a withdraw request and deducts the amount from the user's balance."""
     try:
-        wid = int(callback.data.split("_")[2])
+        wid = int(callback.data.removeprefix("withdraw_accept_"))
         withdraw = next((w for w in get_pending_withdraws() if w['id'] == wid), None)
         if not withdraw:
             await callback.message.edit_text(
@@ -426,7 +414,7 @@ async def accept_withdraw(callback: types.CallbackQuery):
 async def reject_withdraw(callback: types.CallbackQuery):
     """Rejects a withdraw request."""
     try:
-        wid = int(callback.data.split("_")[2])
+        wid = int(callback.data.removeprefix("withdraw_reject_"))
         set_withdraw_status(wid, "rejected")
         withdraw = next((w for w in get_pending_withdraws() if w['id'] == wid), None)
         if withdraw:
@@ -509,14 +497,14 @@ def register_handlers(dp: Dispatcher):
     )
     dp.register_callback_query_handler(
         accept_withdraw,
-        lambda c: c.data.startswith("withdraw_accept_"),
+        CallbackPrefixFilter("withdraw_accept_"),
         IsPrivateCallback(),
         IsAdminCallback(),
         state="*"
     )
     dp.register_callback_query_handler(
         reject_withdraw,
-        lambda c: c.data.startswith("withdraw_reject_"),
+        CallbackPrefixFilter("withdraw_reject_"),
         IsPrivateCallback(),
         IsAdminCallback(),
         state="*"
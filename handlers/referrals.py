@@ -1,13 +1,81 @@
+import asyncio
 import logging
+import time
+from typing import Dict, Optional, Tuple
+
 from aiogram import types, Bot
 from aiogram.dispatcher.filters import Text
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
-from database import get_user_referrals, get_user, get_setting
+from database import get_user_referrals
 from keyboards.user_keyboards import main_menu_kb
-from utils.filters import IsPrivate, IsNotBlocked, IsPrivateCallback, IsNotBlockedCallback
+from utils.settings_cache import cached_setting
+from utils.filters import IsPrivate, IsNotBlocked, IsPrivateCallback, IsNotBlockedCallback, CallbackPrefixFilter
 
 logger = logging.getLogger(__name__)
 
+async def _db(fn, *args, **kwargs):
+    """Runs a blocking database call in a worker thread so the event loop stays free."""
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+# Bot ma'lumotlari o'zgarmaydi - bitta get_me() natijasini butun jarayon uchun saqlaymiz
+_me_cache: Optional[types.User] = None
+_me_lock = asyncio.Lock()
+
+async def _get_me(bot: Bot) -> types.User:
+    """Returns the cached bot user, fetching it from Telegram only once."""
+    global _me_cache
+    if _me_cache is None:
+        async with _me_lock:
+            if _me_cache is None:
+                _me_cache = await bot.get_me()
+    return _me_cache
+
+# Sahifalash: bitta xabar Telegramning 4096 belgi limitidan oshmasligi uchun
+_PAGE_SIZE = 50
+_REFERRALS_CACHE_TTL = 60.0
+_REFERRALS_CACHE_MAX = 1024  # Chegara - har sahifalagan foydalanuvchi uchun ro'yxat qolib ketmasligi uchun
+_referrals_cache: Dict[int, tuple] = {}
+
+async def _get_referrals_cached(user_id: int) -> list:
+    """Returns the user's referrals, cached briefly so paging doesn't re-query the database."""
+    now = time.monotonic()
+    entry = _referrals_cache.get(user_id)
+    if entry and now - entry[0] < _REFERRALS_CACHE_TTL:
+        return entry[1]
+    referrals = await _db(get_user_referrals, user_id)
+    if len(_referrals_cache) >= _REFERRALS_CACHE_MAX:
+        # Avval muddati o'tganlar, yetmasa eng eski kiritilganlar chiqariladi
+        for uid, (ts, _) in list(_referrals_cache.items()):
+            if now - ts >= _REFERRALS_CACHE_TTL:
+                del _referrals_cache[uid]
+        while len(_referrals_cache) >= _REFERRALS_CACHE_MAX:
+            _referrals_cache.pop(next(iter(_referrals_cache)))
+    _referrals_cache[user_id] = (now, referrals)
+    return referrals
+
+def _render_page(referrals: list, page: int, page_size: int = _PAGE_SIZE) -> Tuple[str, bool]:
+    """
+    Renders one page of the referral list.
+    Args:
+        referrals: Full referral list.
+        page: Zero-based page number.
+        page_size: Rows per page.
+    Returns:
+        Tuple of (page text, whether more pages follow).
+    """
+    start = page * page_size
+    rows = []
+    for ref in referrals[start:start + page_size]:
+        username = format_username({'username': ref.get('referred_username'), 'id': ref['referred_id']})
+        level = ref.get('level', 1)
+        rows.append(f"- {username} (Bonus: {ref['bonus']} so‘m, {level}-daraja)\n")
+    return "".join(rows), start + page_size < len(referrals)
+
+def _log_notify_result(task: asyncio.Task) -> None:
+    """Logs failures of background admin notifications."""
+    if not task.cancelled() and task.exception():
+        logger.warning(f"Failed to notify admin about referral stats: {task.exception()}")
+
 def format_username(user: dict) -> str:
     """Formats the username or user ID for display."""
     return f"@{user['username']}" if user and user.get('username') else f"ID: {user['id']}"
@@ -22,35 +90,42 @@ async def send_referrals_stats(user_id: int, bot: Bot, message: types.Message =
         callback: CallbackQuery object for inline updates.
     """
     try:
-        referrals = get_user_referrals(user_id)
+        # Mustaqil so'rovlar - parallel bajaramiz
+        referrals, admin_chat = await asyncio.gather(
+            _get_referrals_cached(user_id),
+            _db(cached_setting, "admin_chat_id"),
+        )
         total_referrals = len(referrals)
         total_bonus = sum(ref.get('bonus', 0) for ref in referrals)
 
-        bot_info = await bot.get_me()
+        bot_info = await _get_me(bot)
         ref_link = f"https://t.me/{bot_info.username}?start=ref_{user_id}"
 
-        text = (
+        # Matnni ro'yxatda yig'ib bitta join bilan tuzamiz (+= ga qaraganda ancha tez)
+        parts = [
             f"<b>👥 Referral statistikangiz:</b>\n\n"
             f"📊 Jami referallar: {total_referrals} ta\n"
             f"💸 Jami bonus: {total_bonus} so‘m\n"
             f"🔗 <a href='{ref_link}'>Sizning referral havolangiz</a>\n\n"
-        )
+        ]
 
+        has_next = False
         if referrals:
-            text += "<b>📋 Referal foydalanuvchilar:</b>\n"
-            for ref in referrals:
-                referred_user = get_user(ref['referred_id'])
-                username = format_username(referred_user)
-                level = ref.get('level', 1)
-                text += f"- {username} (Bonus: {ref['bonus']} so‘m, {level}-daraja)\n"
+            parts.append("<b>📋 Referal foydalanuvchilar:</b>\n")
+            page_text, has_next = _render_page(referrals, 0)
+            parts.append(page_text)
         else:
-            text += "Hozircha referal foydalanuvchilar yo‘q. Do‘stlaringizni taklif qiling va bonus oling!"
+            parts.append("Hozircha referal foydalanuvchilar yo‘q. Do‘stlaringizni taklif qiling va bonus oling!")
+
+        text = "".join(parts)
 
         kb = InlineKeyboardMarkup(row_width=2)
         kb.add(
             InlineKeyboardButton("📋 Havolani nusxalash", callback_data="copy_ref_link"),
             InlineKeyboardButton("ℹ️ Referral haqida", callback_data="referral_info")
         )
+        if has_next:
+            kb.add(InlineKeyboardButton("▶ Keyingi", callback_data="ref_page_1"))
         kb.add(InlineKeyboardButton("🏠 Asosiy menyu", callback_data="back_to_main"))
 
         if callback:
@@ -59,18 +134,15 @@ async def send_referrals_stats(user_id: int, bot: Bot, message: types.Message =
         else:
             await message.answer(text, parse_mode="HTML", reply_markup=kb, disable_web_page_preview=True)
 
-        # Notify admins about referral activity (optional)
-        admin_chat = get_setting("admin_chat_id")
+        # Notify admins about referral activity (optional) - foydalanuvchi javobini kutib turmaydi
         if admin_chat and total_referrals > 0:
-            try:
-                await bot.send_message(
-                    admin_chat,
-                    f"📢 Foydalanuvchi {user_id} referral statistikasini ko‘rdi:\n"
-                    f"Referallar: {total_referrals} ta, Jami bonus: {total_bonus} so‘m",
-                    parse_mode="HTML"
-                )
-            except Exception as e:
-                logger.warning(f"Failed to notify admin about referral stats: {e}")
+            notify_task = asyncio.create_task(bot.send_message(
+                admin_chat,
+                f"📢 Foydalanuvchi {user_id} referral statistikasini ko‘rdi:\n"
+                f"Referallar: {total_referrals} ta, Jami bonus: {total_bonus} so‘m",
+                parse_mode="HTML"
+            ))
+            notify_task.add_done_callback(_log_notify_result)
 
     except Exception as e:
         logger.exception(f"Referral stats failed for user {user_id}: {e}")
@@ -92,7 +164,7 @@ async def show_referrals(message: types.Message):
 async def copy_ref_link(callback: types.CallbackQuery):
     """Handles the copy referral link action."""
     user_id = callback.from_user.id
-    bot_info = await callback.bot.get_me()
+    bot_info = await _get_me(callback.bot)
     ref_link = f"https://t.me/{bot_info.username}?start=ref_{user_id}"
     await callback.message.answer(
         f"🔗 Referral havolangiz:\n{ref_link}\n\nHavolani nusxalash uchun bosing va do‘stlaringizga yuboring!",
@@ -101,9 +173,33 @@ async def copy_ref_link(callback: types.CallbackQuery):
     )
     await callback.answer("✅ Havola nusxalash uchun tayyor!")
 
+async def referral_page(callback: types.CallbackQuery):
+    """Shows the requested page of the user's referral list."""
+    page = int(callback.data.removeprefix("ref_page_"))
+    referrals = await _get_referrals_cached(callback.from_user.id)
+    page_text, has_next = _render_page(referrals, page)
+    if not page_text:
+        await callback.answer("📄 Boshqa sahifa yo‘q")
+        return
+    kb = InlineKeyboardMarkup(row_width=2)
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("◀ Oldingi", callback_data=f"ref_page_{page - 1}"))
+    if has_next:
+        nav.append(InlineKeyboardButton("▶ Keyingi", callback_data=f"ref_page_{page + 1}"))
+    if nav:
+        kb.row(*nav)
+    kb.add(InlineKeyboardButton("🏠 Asosiy menyu", callback_data="back_to_main"))
+    await callback.message.edit_text(
+        f"<b>📋 Referal foydalanuvchilar ({page + 1}-sahifa):</b>\n{page_text}",
+        parse_mode="HTML",
+        reply_markup=kb
+    )
+    await callback.answer()
+
 async def referral_info(callback: types.CallbackQuery):
     """Shows information about the referral program."""
-    info_text = get_setting("referral_info_text") or (
+    info_text = await _db(cached_setting, "referral_info_text") or (
         "<b>ℹ️ Referral dasturi haqida:</b>\n\n"
         "Do‘stlaringizni botga taklif qiling va har bir faol referal uchun bonus oling!\n"
         "- Har bir 1-daraja referal uchun: <b>500 so‘m</b>\n"
@@ -129,4 +225,5 @@ def register_handlers(dp):
     dp.register_message_handler(show_referrals, IsPrivate(), IsNotBlocked(), Text(equals="👥 Referallar"), state='*')
     dp.register_callback_query_handler(copy_ref_link, IsPrivateCallback(), IsNotBlockedCallback(), Text(equals="copy_ref_link"), state='*')
     dp.register_callback_query_handler(referral_info, IsPrivateCallback(), IsNotBlockedCallback(), Text(equals="referral_info"), state='*')
+    dp.register_callback_query_handler(referral_page, IsPrivateCallback(), IsNotBlockedCallback(), CallbackPrefixFilter("ref_page_"), state='*')
     dp.register_callback_query_handler(back_to_main_menu, IsPrivateCallback(), IsNotBlockedCallback(), Text(equals="back_to_main"), state='*')
\ No newline at end of file
@@ -1,15 +1,18 @@
+import asyncio
 import logging
-import datetime
-from aiogram import types
+import time
+from typing import Optional
+
+from aiogram import types, Bot
 from aiogram.dispatcher import Dispatcher, FSMContext
 from aiogram.dispatcher.filters import Text
 from aiogram.dispatcher.filters.state import State, StatesGroup
 from aiogram.utils.exceptions import BotBlocked, UserDeactivated
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 
-from database import get_admin_list, get_user, insert_support_message, update_support_reply
+from database import get_admin_list, get_user, bulk_insert_support_messages, update_support_reply
 from keyboards.user_keyboards import main_menu_kb, cancel_kb
-from keyboards.admin_keyboards import support_reply_inline_kb
+from keyboards.admin_keyboards import support_reply_inline_kb, support_cb
 from utils.filters import IsPrivateCallback, IsNotBlockedCallback, IsAdminCallback
 
 logger = logging.getLogger(__name__)
@@ -23,13 +26,150 @@ class SupportStates(StatesGroup):
 # Maksimal xabar uzunligi
 MAX_MESSAGE_LENGTH = 1000
 
+# Admin fan-out uchun parallel yuborish limiti (Telegram 30 msg/s global limiti)
+_FANOUT_SEMAPHORE = asyncio.Semaphore(20)
+
+async def _db(fn, *args, **kwargs):
+    """Runs a blocking database call in a worker thread so the event loop stays free."""
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+# Admin ro'yxati kam o'zgaradi - 30 soniya keshlab turamiz
+_ADMINS_CACHE_TTL = 30.0
+_admins_cache: Optional[tuple] = None
+
+def _get_admins_cached() -> list:
+    """Returns the admin list, refreshing it from the database at most every 30 seconds."""
+    global _admins_cache
+    now = time.monotonic()
+    if _admins_cache and now - _admins_cache[0] < _ADMINS_CACHE_TTL:
+        return _admins_cache[1]
+    admins = get_admin_list()
+    _admins_cache = (now, admins)
+    return admins
+
+def invalidate_admins() -> None:
+    """Clears the cached admin list (call after adding/removing admins)."""
+    global _admins_cache
+    _admins_cache = None
+
+# Write-behind: xabarlar navbatga tushadi, fon task ularni to'plab bitta tranzaksiyada yozadi
+_SUPPORT_FLUSH_BATCH = 64
+_support_queue: asyncio.Queue = asyncio.Queue()
+_support_flusher_task: Optional[asyncio.Task] = None
+
+async def _support_flusher() -> None:
+    """Drains the support insert queue and writes rows to the database in batches."""
+    while True:
+        batch = [await _support_queue.get()]
+        while len(batch) < _SUPPORT_FLUSH_BATCH:
+            try:
+                batch.append(_support_queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        try:
+            await asyncio.to_thread(bulk_insert_support_messages, batch)
+        except Exception as e:
+            logger.exception(f"Failed to flush {len(batch)} support messages: {e}")
+        finally:
+            for _ in batch:
+                _support_queue.task_done()
+
+def _enqueue_support_message(row: tuple) -> None:
+    """Queues a support message row and lazily starts the background flusher."""
+    global _support_flusher_task
+    if _support_flusher_task is None or _support_flusher_task.done():
+        _support_flusher_task = asyncio.create_task(_support_flusher())
+    _support_queue.put_nowait(row)
+
+# Har bir chat uchun alohida navbat: bitta chatning fan-outi boshqa chatlarni kutdirmaydi,
+# lekin bitta chat ichida tartib saqlanadi
+_CHAT_WORKER_IDLE_TIMEOUT = 60.0
+_chat_queues: dict = {}
+_chat_workers: dict = {}
+_WORKERS_SEMAPHORE = asyncio.Semaphore(100)
+
+async def _fanout_to_admins(bot: Bot, user_id: int, support_id: str, text: str,
+                            file_id: Optional[str], file_type: Optional[str],
+                            full_name: str, username: Optional[str]):
+    """Performs the admin fan-out for one support message."""
+    admins, user = await asyncio.gather(_db(_get_admins_cached), _db(get_user, user_id))
+    if not admins:
+        logger.warning(f"No admins available to forward support message {support_id}")
+        return
+
+    user_info = (
+        f"👤 <b>Foydalanuvchi:</b> {full_name} (@{username or 'N/A'}, ID: {user_id})\n"
+        f"📞 <b>Telefon:</b> {user.get('phone', 'Yo‘q')}\n"
+        f"💰 <b>Balans:</b> {user.get('balance', 0)} so‘m\n"
+        f"💬 <b>Xabar:</b> {text or 'Fayl yuborildi'}\n"
+        f"🆔 <b>Support ID:</b> {support_id}"
+    )
+
+    # Klaviatura barcha adminlar uchun bir xil - bir marta quramiz
+    kb = support_reply_inline_kb(user_id, support_id)
+    tasks = [
+        _send_to_admin(bot, admin_id, user_info, file_id, file_type, kb)
+        for admin_id in admins
+    ]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for admin_id, result in zip(admins, results):
+        if isinstance(result, (BotBlocked, UserDeactivated)):
+            logger.warning(f"Failed to send support message to admin {admin_id}")
+        elif isinstance(result, Exception):
+            logger.error(f"Unexpected error sending to admin {admin_id}: {result}")
+
+async def _chat_worker(user_id: int) -> None:
+    """Processes one chat's queued fan-out jobs in order, then exits when idle."""
+    queue = _chat_queues[user_id]
+    while True:
+        try:
+            job = await asyncio.wait_for(queue.get(), timeout=_CHAT_WORKER_IDLE_TIMEOUT)
+        except asyncio.TimeoutError:
+            if queue.empty():
+                _chat_workers.pop(user_id, None)
+                _chat_queues.pop(user_id, None)
+                return
+            continue
+        async with _WORKERS_SEMAPHORE:
+            try:
+                await _fanout_to_admins(*job)
+            except Exception as e:
+                logger.exception(f"Support fan-out failed for chat {user_id}: {e}")
+            finally:
+                queue.task_done()
+
+def _enqueue_fanout(user_id: int, job: tuple) -> None:
+    """Queues a fan-out job on the user's chat queue, starting its worker if needed."""
+    queue = _chat_queues.get(user_id)
+    if queue is None:
+        queue = asyncio.Queue()
+        _chat_queues[user_id] = queue
+    queue.put_nowait(job)
+    worker = _chat_workers.get(user_id)
+    if worker is None or worker.done():
+        _chat_workers[user_id] = asyncio.create_task(_chat_worker(user_id))
+
+async def _send_to_admin(
+    bot: Bot,
+    admin_id: int,
+    user_info: str,
+    file_id: str,
+    file_type: str,
+    kb: InlineKeyboardMarkup,
+):
+    """Sends one support message copy to a single admin (used in parallel fan-out)."""
+    async with _FANOUT_SEMAPHORE:
+        if file_id and file_type == "photo":
+            await bot.send_photo(admin_id, file_id, caption=user_info, parse_mode="HTML", reply_markup=kb)
+        elif file_id and file_type == "document":
+            await bot.send_document(admin_id, file_id, caption=user_info, parse_mode="HTML", reply_markup=kb)
+        else:
+            await bot.send_message(admin_id, user_info, parse_mode="HTML", reply_markup=kb)
+
 def validate_message(text: str) -> bool:
-    """Validates the support message length and content."""
-    if not text or len(text.strip()) == 0:
-        return False
-    if len(text) > MAX_MESSAGE_LENGTH:
-        return False
-    return True
+    """Validates the support message length and content without copying the text."""
+    # isspace() strip() dan farqli ravishda yangi satr yaratmaydi
+    return bool(text) and len(text) <= MAX_MESSAGE_LENGTH and not text.isspace()
 
 async def ask_support_message(message: types.Message, state: FSMContext):
     """Prompts the user to send a support message."""
@@ -47,7 +187,7 @@ async def ask_support_message(message: types.Message, state: FSMContext):
 async def forward_support_message(message: types.Message, state: FSMContext):
     """Forwards the user's support message to admins."""
     user_id = message.from_user.id
-    support_id = f"SUP_{user_id}_{int(datetime.datetime.now().timestamp())}"
+    support_id = f"SUP_{user_id}_{int(time.time())}"
     text = message.html_text if message.text else ""
     file_id = None
     file_type = None
@@ -68,66 +208,14 @@ async def forward_support_message(message: types.Message, state: FSMContext):
         file_id = message.document.file_id
         file_type = "document"
 
-    # Save to database
-    try:
-        insert_support_message(user_id, support_id, text or "", file_id, file_type)
-    except Exception as e:
-        logger.exception(f"Failed to save support message {support_id}: {e}")
-        await message.answer(
-            "❌ Xabar yuborishda xato yuz berdi. Iltimos, qayta urinib ko‘ring.",
-            reply_markup=main_menu_kb()
-        )
-        await state.finish()
-        return
-
-    # Forward to admins
-    admins = get_admin_list()
-    if not admins:
-        await message.answer(
-            "❌ Adminlar topilmadi. Iltimos, keyinroq qayta urinib ko‘ring.",
-            reply_markup=main_menu_kb()
-        )
-        await state.finish()
-        return
-
-    user = get_user(user_id)
-    user_info = (
-        f"👤 <b>Foydalanuvchi:</b> {message.from_user.full_name} (@{message.from_user.username or 'N/A'}, ID: {user_id})\n"
-        f"📞 <b>Telefon:</b> {user.get('phone', 'Yo‘q')}\n"
-        f"💰 <b>Balans:</b> {user.get('balance', 0)} so‘m\n"
-        f"💬 <b>Xabar:</b> {text or 'Fayl yuborildi'}\n"
-        f"🆔 <b>Support ID:</b> {support_id}"
-    )
+    # Save to database (write-behind: javob kutmasdan navbatga qo'yamiz)
+    _enqueue_support_message((support_id, user_id, text or "", file_id, file_type))
 
-    for admin_id in admins:
-        try:
-            if file_id and file_type == "photo":
-                await message.bot.send_photo(
-                    admin_id,
-                    file_id,
-                    caption=user_info,
-                    parse_mode="HTML",
-                    reply_markup=support_reply_inline_kb(user_id, support_id)
-                )
-            elif file_id and file_type == "document":
-                await message.bot.send_document(
-                    admin_id,
-                    file_id,
-                    caption=user_info,
-                    parse_mode="HTML",
-                    reply_markup=support_reply_inline_kb(user_id, support_id)
-                )
-            else:
-                await message.bot.send_message(
-                    admin_id,
-                    user_info,
-                    parse_mode="HTML",
-                    reply_markup=support_reply_inline_kb(user_id, support_id)
-                )
-        except (BotBlocked, UserDeactivated):
-            logger.warning(f"Failed to send support message to admin {admin_id}")
-        except Exception as e:
-            logger.error(f"Unexpected error sending to admin {admin_id}: {e}")
+    # Forward to admins: ishni shu chatning navbatiga qo'yamiz va foydalanuvchiga darhol javob beramiz
+    _enqueue_fanout(user_id, (
+        message.bot, user_id, support_id, text, file_id, file_type,
+        message.from_user.full_name, message.from_user.username,
+    ))
 
     await message.answer(
         f"✅ Xabaringiz adminlarga yuborildi (ID: {support_id}).\n"
@@ -141,15 +229,16 @@ async def cancel_support(message: types.Message, state: FSMContext):
     await state.finish()
     await message.answer("❌ Xabar yuborish bekor qilindi.", reply_markup=main_menu_kb())
 
-async def ask_admin_reply(callback: types.CallbackQuery, state: FSMContext):
+async def ask_admin_reply(callback: types.CallbackQuery, state: FSMContext, callback_data: dict):
     """Prompts the admin to reply to a support message."""
-    data = callback.data.split("_")
-    user_id = int(data[1])
-    support_id = data[2] if len(data) > 2 else None
+    user_id = int(callback_data["user_id"])
+    support_id = callback_data["support_id"]
+    if support_id == "-":
+        support_id = None
     await state.update_data(reply_to_user=user_id, support_id=support_id)
 
     kb = InlineKeyboardMarkup(row_width=2).add(
-        InlineKeyboardButton("📤 Oldindan ko‘rish", callback_data=f"preview_reply_{user_id}_{support_id}"),
+        InlineKeyboardButton("📤 Oldindan ko‘rish", callback_data=support_cb.new(action="preview", user_id=user_id, support_id=support_id or "-")),
         InlineKeyboardButton("🏠 Asosiy menyu", callback_data="back_to_main")
     )
     await callback.message.answer(
@@ -170,10 +259,15 @@ async def preview_admin_reply(callback: types.CallbackQuery, state: FSMContext):
         return
     user_id = data.get("reply_to_user")
     support_id = data.get("support_id")
+    # send_admin_reply allaqachon xuddi shu matnni ko'rsatgan bo'lsa, qayta yubormaymiz
+    if data.get("preview_shown_text") == reply_text:
+        await callback.answer("ℹ️ Javob allaqachon ko‘rsatilgan", show_alert=True)
+        return
+    await state.update_data(preview_shown_text=reply_text)
     kb = InlineKeyboardMarkup(row_width=2)
     kb.add(
-        InlineKeyboardButton("✅ Yuborish", callback_data=f"send_reply_{user_id}_{support_id}"),
-        InlineKeyboardButton("✏️ Tahrirlash", callback_data=f"edit_reply_{user_id}_{support_id}"),
+        InlineKeyboardButton("✅ Yuborish", callback_data=support_cb.new(action="send", user_id=user_id, support_id=support_id or "-")),
+        InlineKeyboardButton("✏️ Tahrirlash", callback_data=support_cb.new(action="edit", user_id=user_id, support_id=support_id or "-")),
         InlineKeyboardButton("🏠 Asosiy menyu", callback_data="back_to_main")
     )
     await callback.message.answer(
@@ -192,14 +286,15 @@ async def send_admin_reply(message: types.Message, state: FSMContext):
             reply_markup=main_menu_kb()
         )
         return
-    await state.update_data(admin_reply_text=reply_text)
+    # Bu yerda preview ham darhol ko'rsatiladi - keyin "Oldindan ko'rish" bosilsa takrorlanmaydi
+    await state.update_data(admin_reply_text=reply_text, preview_shown_text=reply_text)
     data = await state.get_data()
     user_id = data.get("reply_to_user")
     support_id = data.get("support_id")
     kb = InlineKeyboardMarkup(row_width=2)
     kb.add(
-        InlineKeyboardButton("✅ Yuborish", callback_data=f"send_reply_{user_id}_{support_id}"),
-        InlineKeyboardButton("✏️ Tahrirlash", callback_data=f"edit_reply_{user_id}_{support_id}"),
+        InlineKeyboardButton("✅ Yuborish", callback_data=support_cb.new(action="send", user_id=user_id, support_id=support_id or "-")),
+        InlineKeyboardButton("✏️ Tahrirlash", callback_data=support_cb.new(action="edit", user_id=user_id, support_id=support_id or "-")),
         InlineKeyboardButton("🏠 Asosiy menyu", callback_data="back_to_main")
     )
     await message.answer(
@@ -225,7 +320,7 @@ async def confirm_send_reply(callback: types.CallbackQuery, state: FSMContext):
 
         # Update database
         try:
-            update_support_reply(support_id, reply_text)
+            await _db(update_support_reply, support_id, reply_text)
         except Exception as e:
             logger.exception(f"Failed to update support reply {support_id}: {e}")
 
@@ -247,7 +342,7 @@ async def edit_admin_reply(callback: types.CallbackQuery, state: FSMContext):
     user_id = data.get("reply_to_user")
     support_id = data.get("support_id")
     kb = InlineKeyboardMarkup(row_width=2).add(
-        InlineKeyboardButton("📤 Oldindan ko‘rish", callback_data=f"preview_reply_{user_id}_{support_id}"),
+        InlineKeyboardButton("📤 Oldindan ko‘rish", callback_data=support_cb.new(action="preview", user_id=user_id, support_id=support_id or "-")),
         InlineKeyboardButton("🏠 Asosiy menyu", callback_data="back_to_main")
     )
     await callback.message.answer(
@@ -259,6 +354,29 @@ async def edit_admin_reply(callback: types.CallbackQuery, state: FSMContext):
     await SupportStates.waiting_for_admin_reply.set()
     await callback.answer()
 
+async def dispatch_support_callback(callback: types.CallbackQuery, state: FSMContext, callback_data: dict):
+    """
+    Routes all support admin callbacks through a single registered handler.
+    The action comes pre-parsed from the support_cb factory, so support IDs
+    containing underscores no longer break parsing.
+    """
+    action = callback_data["action"]
+    if action == "ask":
+        await ask_admin_reply(callback, state, callback_data)
+        return
+    # Oldindan ko'rish faqat javob kutish holatida ishlaydi (eski ro'yxatdagi state filtri)
+    if action == "preview" and await state.get_state() != SupportStates.waiting_for_admin_reply.state:
+        await callback.answer()
+        return
+    handlers = {
+        "preview": preview_admin_reply,
+        "send": confirm_send_reply,
+        "edit": edit_admin_reply,
+    }
+    handler = handlers.get(action)
+    if handler:
+        await handler(callback, state)
+
 async def back_to_main_menu(callback: types.CallbackQuery, state: FSMContext):
     """Returns to the main menu."""
     await state.finish()
@@ -271,9 +389,10 @@ def register_handlers(dp: Dispatcher):
     dp.register_message_handler(forward_support_message, content_types=['text', 'photo', 'document'], state=SupportStates.waiting_for_message)
     dp.register_message_handler(cancel_support, commands=["cancel"], state="*")
     dp.register_message_handler(cancel_support, Text(equals="🏠 Asosiy menyu"), state="*")
-    dp.register_callback_query_handler(ask_admin_reply, lambda c: c.data.startswith("reply_"), IsPrivateCallback(), IsAdminCallback(), state="*")
     dp.register_message_handler(send_admin_reply, content_types=['text'], state=SupportStates.waiting_for_admin_reply)
-    dp.register_callback_query_handler(preview_admin_reply, lambda c: c.data.startswith("preview_reply_"), IsPrivateCallback(), IsAdminCallback(), state=SupportStates.waiting_for_admin_reply)
-    dp.register_callback_query_handler(confirm_send_reply, lambda c: c.data.startswith("send_reply_"), IsPrivateCallback(), IsAdminCallback(), state="*")
-    dp.register_callback_query_handler(edit_admin_reply, lambda c: c.data.startswith("edit_reply_"), IsPrivateCallback(), IsAdminCallback(), state="*")
+    dp.register_callback_query_handler(
+        dispatch_support_callback,
+        support_cb.filter(),
+        IsPrivateCallback(), IsAdminCallback(), state="*"
+    )
     dp.register_callback_query_handler(back_to_main_menu, Text(equals="back_to_main"), IsPrivateCallback(), IsNotBlockedCallback(), state="*")
\ No newline at end of file
@@ -11,6 +11,7 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeybo
 from database import (
     upsert_user,
     get_user,
+    get_users_bulk,
     get_setting,
     get_user_orders,
     get_user_referrals,
@@ -21,7 +22,7 @@ from database import (
     get_help_video_file_id,
 )
 from keyboards.user_keyboards import main_menu_kb, payment_menu_kb
-from utils.filters import IsPrivate, IsNotBlocked, IsPrivateCallback, IsNotBlockedCallback
+from utils.filters import IsPrivate, IsNotBlocked, IsPrivateCallback, IsNotBlockedCallback, CallbackPrefixFilter
 from utils.helpers import bot_send_safe, bot_send_video_safe
 from config import Config
 
@@ -172,8 +173,9 @@ async def cmd_referrals(message: types.Message):
         )
         if referrals:
             text += "Referal foydalanuvchilar:\n"
+            referred_users = get_users_bulk([ref['referred_id'] for ref in referrals])
             for ref in referrals:
-                referred_user = get_user(ref['referred_id'])
+                referred_user = referred_users.get(ref['referred_id'])
                 username = f"@{referred_user['username']}" if referred_user and referred_user.get('username') else f"ID: {ref['referred_id']}"
                 text += f"- {username} (Bonus: {ref['bonus']} so'm)\n"
         else:
@@ -416,7 +418,7 @@ def register_handlers(dp):
     dp.register_message_handler(process_withdraw_amount, IsPrivate(), IsNotBlocked(), state=UserStates.waiting_for_withdraw_amount)
     
     # Callback handlers
-    dp.register_callback_query_handler(cancel_order_callback, lambda c: c.data.startswith("cancel_order_"), IsPrivateCallback(), IsNotBlockedCallback(), state="*")
+    dp.register_callback_query_handler(cancel_order_callback, CallbackPrefixFilter("cancel_order_"), IsPrivateCallback(), IsNotBlockedCallback(), state="*")
     dp.register_callback_query_handler(back_to_main_menu, lambda c: c.data == "back_to_main", IsPrivateCallback(), IsNotBlockedCallback(), state="*")
     dp.register_message_handler(back_to_main_menu_text, Text(equals="🏠 Asosiy menyu"), IsPrivate(), IsNotBlocked(), state="*")
     
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import re
 from urllib.parse import urlparse
@@ -6,14 +7,17 @@ from aiogram import types, Bot
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters import CommandStart, Text
 from aiogram.dispatcher.filters.state import State, StatesGroup
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 
 from database import (
     upsert_user,
     get_user,
+    get_users_bulk,
     get_setting,
     get_user_orders,
+    get_user_orders_count,
     get_user_referrals,
+    get_referral_stats,
     cancel_order as db_cancel_order,
     create_order,
     create_withdraw_request,
@@ -23,10 +27,33 @@ from database import (
 from keyboards.user_keyboards import main_menu_kb, payment_menu_kb
 from utils.filters import IsPrivate, IsNotBlocked
 from utils.helpers import bot_send_safe, bot_send_video_safe
+from utils.outbound import outbound
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+async def _db(fn, *args, **kwargs):
+    """Runs a blocking database call in a worker thread so the event loop stays free."""
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+# Bot username o'zgarmaydi - startupda bir marta o'rnatiladi, get_me() chaqiruvi tejaladi
+_BOT_USERNAME = None
+_bot_username_lock = asyncio.Lock()
+
+def set_bot_username(username: str) -> None:
+    """Stores the bot username once at startup so handlers avoid get_me() calls."""
+    global _BOT_USERNAME
+    _BOT_USERNAME = username
+
+async def _get_bot_username(bot: Bot) -> str:
+    """Returns the cached bot username, fetching it once if startup didn't set it."""
+    global _BOT_USERNAME
+    if _BOT_USERNAME is None:
+        async with _bot_username_lock:
+            if _BOT_USERNAME is None:
+                _BOT_USERNAME = (await bot.get_me()).username
+    return _BOT_USERNAME
+
 # States for FSM
 class UserStates(StatesGroup):
     waiting_for_url = State()
@@ -35,17 +62,71 @@ class UserStates(StatesGroup):
     waiting_for_withdraw_type = State()
     waiting_for_withdraw_amount = State()
 
+# Statik klaviaturalar - har chaqiruvda qayta qurilmaydi
+_HOME_ONLY_KB = ReplyKeyboardMarkup(resize_keyboard=True).add(KeyboardButton("🏠 Asosiy menyu"))
+_REMOVE_KB = ReplyKeyboardRemove()
+# Tugma bir nechta markupda qayta ishlatilsa bo'ladi - har renderda yangi obyekt shart emas
+_BACK_TO_MAIN_BTN = InlineKeyboardButton("🏠 Asosiy menyu", callback_data="back_to_main")
+
+# Filtrlar holatsiz predikatlar - har ro'yxatdan o'tkazishda yangi nusxa shart emas
+_PRIVATE_NOT_BLOCKED = (IsPrivate(), IsNotBlocked())
+
+# Bir sahifada ko'rsatiladigan zakazlar soni
+_ORDERS_PAGE_SIZE = 20
+
+# Zakaz holatlarining o'zbekcha nomlari
+_STATUS_MAP = {
+    'pending': 'Kutilmoqda',
+    'approved': 'Tasdiqlangan',
+    'rejected': 'Rad etilgan'
+}
+
+# Predefined Yandex Market URL for wireless headphones M10 - prompt matni ham
+# bir marta yig'iladi, har zakazda ~700 baytlik f-string qurilmaydi
+_YANDEX_URL = "https://market.yandex.uz/card/besprovodnyye-naushniki-m10/4591765711?do-waremd5=xUwa_LZ8sDvgfu6PoGxQZw&cpc=M-FlYaOgf0DWvjCgIUd8xpU-AGo0-83Sf8wXWhG5qj-6hjPrxABz5Hcv6a-YbnyWIDIYrK-BFpxeRnox88bZWfpygLY_JSdII3rE8HLz3YJVeOMqJ1zlcY-SG8ZEpPFMOMuCdH6OKShCpOuiDeRVWSeE7SnU3gg4UjcjrDc6TGBGuIF9ARq0PWGyNsOGNSGgsPYwfgsu1VnPZva5pBZUzih95szELAdNO9PwsNZvPPnIaa-tAmHT6FTYXkHz4IWLN79xmcvzqX4h28Q5tLa0ZNV3G5faoHFwVJ8gCJkIMbbc5spYxey5sbDBJtJSA-izqGzzKJHHKNLADinX27y0_i6iIKLgLz883el3ZtbpbRYREus0BPf7JEVJSGqCnO_AnomimgEYCpeRGSb7o6S700zxnsOhOiJfj-AI-PVpXdGmAU6hyl7DpKtPmV2QnobvrLU67jh8rtU3_CdkcX-E-hV7NrePTjAYDKH2sLg5XS4rLFY_HN5KuksR1DXudaB-5MnDh-mZ-fjAJzttIAYo4RmFYHQ34O52sUy52xbem-AIGZ0noUk_sLHg5VWLO30h&ogV=-3"
+_ORDER_PROMPT = (
+    f"✅ Mahsulot URL avtomatik ravishda o'rnatildi!\n"
+    f"🔗 Mahsulot: {_YANDEX_URL}\n\n"
+    f"📸 Endi mahsulot skrinshotini yuboring:"
+)
+
+# Validator patternlari bir marta kompilyatsiya qilinadi - har chaqiruvda re kesh qidiruvi yo'q
+_CARD_RE = re.compile(r'\d{16}')
+_PHONE_RE = re.compile(r'\+998\d{9}')
+_TRC20_RE = re.compile(r'T[1-9A-HJ-NP-Za-km-z]{33}')
+
 def validate_card_number(card_number: str) -> bool:
     """Validates a 16-digit card number."""
-    return bool(re.match(r'^\d{16}$', card_number.replace(" ", "")))
+    return _CARD_RE.fullmatch(card_number.replace(" ", "")) is not None
 
 def validate_phone_number(phone: str) -> bool:
     """Validates a phone number starting with +998 followed by 9 digits."""
-    return bool(re.match(r'^\+998\d{9}$', phone.replace(" ", "")))
+    return _PHONE_RE.fullmatch(phone.replace(" ", "")) is not None
 
 def validate_trc20_address(wallet: str) -> bool:
     """Validates a TRC20 wallet address."""
-    return bool(re.match(r'^T[1-9A-HJ-NP-Za-km-z]{33}$', wallet.strip()))
+    return _TRC20_RE.fullmatch(wallet.strip()) is not None
+
+# Yechib olish turi -> (validator, xato matni, hamyon so'rash matni) - if/elif
+# zanjiri o'rniga bitta dict qidiruvi, xabar matnlari ham bir joyda
+_WITHDRAW_VALIDATORS = {
+    "💳 Karta": (
+        validate_card_number,
+        "❌ Noto'g'ri karta raqami! 16 ta raqam kiriting.",
+        "💳 Karta raqamini kiriting (16 ta raqam):",
+    ),
+    "📱 Telefon": (
+        validate_phone_number,
+        "❌ Noto'g'ri telefon raqami! +998XXXXXXXXX formatida kiriting.",
+        "📱 Telefon raqamini kiriting (+998XXXXXXXXX):",
+    ),
+    "💰 USDT TRC20": (
+        validate_trc20_address,
+        "❌ Noto'g'ri USDT TRC20 manzil! T bilan boshlanuvchi 34 belgili manzil kiriting.",
+        "💰 USDT TRC20 manzilini kiriting:",
+    ),
+}
+_WITHDRAW_TYPES = frozenset(_WITHDRAW_VALIDATORS)
 
 async def send_main_menu(user_id: int, bot: Bot):
     """Sends the main menu to the user."""
@@ -66,17 +147,20 @@ async def cmd_start(message: types.Message):
 
     # Handle referral if provided
     args = message.get_args()
-    if args and args.startswith("ref_"):
-        referrer_id = args.split("_")[1]
-        try:
-            get_or_create_user(user_id, username, referrer_id=int(referrer_id))
-        except Exception as e:
-            logger.warning(f"Failed to process referral for user {user_id}: {e}")
-    else:
-        get_or_create_user(user_id, username)
 
-    # Help video file ID
-    video_file_id = get_help_video_file_id()
+    async def _register():
+        if args and args.startswith("ref_"):
+            referrer_id = args.split("_")[1]
+            try:
+                await _db(get_or_create_user, user_id, username, referrer_id=int(referrer_id))
+            except Exception as e:
+                logger.warning(f"Failed to process referral for user {user_id}: {e}")
+        else:
+            try:
+                await _db(get_or_create_user, user_id, username)
+            except Exception as e:
+                logger.exception(f"Failed to register user {user_id}: {e}")
+
     welcome_text = (
         f"Xush kelibsiz, {username or 'foydalanuvchi'}! 🎉\n"
         f"Botimizga xush kelibsiz! Quyida qo'llanma videoni ko'rishingiz mumkin.\n"
@@ -84,100 +168,151 @@ async def cmd_start(message: types.Message):
         f"Har qanday savol uchun {Config.channel.SUPPORT_USERNAME} bilan bog'laning."
     )
 
-    # Send video or fallback to text
-    try:
-        if video_file_id:
-            success = await bot_send_video_safe(
-                bot=message.bot,
-                user_id=user_id,
-                video=video_file_id,
-                caption=welcome_text,
-                reply_markup=main_menu_kb()
-            )
-            if not success:
-                logger.warning(f"Failed to send welcome video to user {user_id}")
+    async def _send_welcome():
+        # Send video or fallback to text
+        try:
+            video_file_id = await _db(get_help_video_file_id)
+            if video_file_id:
+                success = await bot_send_video_safe(
+                    bot=message.bot,
+                    user_id=user_id,
+                    video=video_file_id,
+                    caption=welcome_text,
+                    reply_markup=main_menu_kb()
+                )
+                if not success:
+                    logger.warning(f"Failed to send welcome video to user {user_id}")
+                    await bot_send_safe(
+                        bot=message.bot,
+                        user_id=user_id,
+                        text=f"{welcome_text}\n⚠️ Qo'llanma videoni yuborishda xato yuz berdi.",
+                        reply_markup=main_menu_kb()
+                    )
+            else:
+                logger.warning("Help video file ID not set in settings")
                 await bot_send_safe(
                     bot=message.bot,
                     user_id=user_id,
-                    text=f"{welcome_text}\n⚠️ Qo'llanma videoni yuborishda xato yuz berdi.",
+                    text=f"{welcome_text}\n⚠️ Qo'llanma video hali sozlanmagan.",
                     reply_markup=main_menu_kb()
                 )
-        else:
-            logger.warning("Help video file ID not set in settings")
+        except Exception as e:
+            logger.exception(f"Error in cmd_start for user {user_id}: {e}")
             await bot_send_safe(
                 bot=message.bot,
                 user_id=user_id,
-                text=f"{welcome_text}\n⚠️ Qo'llanma video hali sozlanmagan.",
+                text="❌ Xato yuz berdi. Iltimos, keyinroq qayta urinib ko'ring.",
                 reply_markup=main_menu_kb()
             )
-    except Exception as e:
-        logger.exception(f"Error in cmd_start for user {user_id}: {e}")
-        await bot_send_safe(
-            bot=message.bot,
-            user_id=user_id,
-            text="❌ Xato yuz berdi. Iltimos, keyinroq qayta urinib ko'ring.",
-            reply_markup=main_menu_kb()
-        )
+
+    # Ro'yxatga olish DB yozuvi Telegram yuborish orqasiga yashirinadi - ikkalasi
+    # parallel boshlanadi, har bir task o'z xatosini ichida ushlaydi
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(_register())
+        tg.create_task(_send_welcome())
 
 async def cmd_balance(message: types.Message):
     """Handles the /balance command to show user balance."""
-    user = get_user(message.from_user.id)
+    user = await _db(get_user, message.from_user.id)
     if user:
         balance = user.get('balance', 0)
         await message.answer(f"💰 Sizning balansingiz: {balance} so'm", reply_markup=payment_menu_kb())
     else:
         await message.answer("❌ Foydalanuvchi ma'lumotlari topilmadi.", reply_markup=main_menu_kb())
 
+async def _render_orders_page(user_id: int, page: int):
+    """
+    Builds one page of the orders list with cancel and navigation buttons.
+    Args:
+        user_id: Telegram user ID.
+        page: 1-based page number.
+    Returns:
+        Tuple of (text, keyboard) or (None, None) if the user has no orders.
+    """
+    # Soni va sahifa qatorlari mustaqil so'rovlar - parallel olinadi
+    total, orders = await asyncio.gather(
+        _db(get_user_orders_count, user_id),
+        _db(get_user_orders, user_id, limit=_ORDERS_PAGE_SIZE, offset=(page - 1) * _ORDERS_PAGE_SIZE),
+    )
+    if not total:
+        return None, None
+    total_pages = max(1, -(-total // _ORDERS_PAGE_SIZE))
+
+    # Matn bo'laklarini ro'yxatda yig'ib bitta join qilamiz - += dan tezroq
+    parts = [f"📦 Sizning zakazlaringiz ({page}/{total_pages}-sahifa):\n\n"]
+    kb = InlineKeyboardMarkup(row_width=1)
+
+    for order in orders:
+        status = _STATUS_MAP.get(order['status'], "Noma'lum")
+        parts.append(f"Zakaz #{order['id']} - Holat: {status}\nURL: {order['product_url']}\n\n")
+        if order['status'] == 'pending':
+            kb.add(InlineKeyboardButton(f"❌ Bekor qilish #{order['id']}", callback_data=f"cancel_order_{order['id']}"))
+
+    # Navigatsiya tugmalari (sahifa chegaralangan - 500 zakazli foydalanuvchi ham
+    # 100 tugmalik klaviatura qurmaydi)
+    nav = []
+    if page > 1:
+        nav.append(InlineKeyboardButton("⬅️ Oldingi", callback_data=f"my_orders_page_{page - 1}"))
+    if page < total_pages:
+        nav.append(InlineKeyboardButton("➡️ Keyingi", callback_data=f"my_orders_page_{page + 1}"))
+    if nav:
+        kb.row(*nav)
+    kb.add(_BACK_TO_MAIN_BTN)
+
+    return "".join(parts), kb
+
 async def cmd_my_orders(message: types.Message):
-    """Handles the /my_orders command, lists orders with cancel buttons for pending ones."""
+    """Handles the /my_orders command, lists orders one page at a time."""
     try:
-        orders = get_user_orders(message.from_user.id)
-        if not orders:
+        text, kb = await _render_orders_page(message.from_user.id, page=1)
+        if text is None:
             await message.answer("📦 Sizda hali zakazlar yo'q.", reply_markup=main_menu_kb())
             return
-
-        status_map = {
-            'pending': 'Kutilmoqda',
-            'approved': 'Tasdiqlangan',
-            'rejected': 'Rad etilgan'
-        }
-
-        text = "📦 Sizning zakazlaringiz:\n\n"
-        kb = InlineKeyboardMarkup(row_width=1)
-
-        for order in orders:
-            status = status_map.get(order['status'], "Noma'lum")
-            text += f"Zakaz #{order['id']} - Holat: {status}\n"
-            text += f"URL: {order['product_url']}\n\n"
-            if order['status'] == 'pending':
-                kb.add(InlineKeyboardButton(f"❌ Bekor qilish #{order['id']}", callback_data=f"cancel_order_{order['id']}"))
-        kb.add(InlineKeyboardButton("🏠 Asosiy menyu", callback_data="back_to_main"))
-
-        await message.answer(text, parse_mode="HTML", reply_markup=kb if kb.inline_keyboard else main_menu_kb())
+        await message.answer(text, parse_mode="HTML", reply_markup=kb)
     except Exception as e:
         logger.exception(f"Error in cmd_my_orders for user {message.from_user.id}: {e}")
         await message.answer("❌ Zakazlarni ko'rsatishda xato yuz berdi.", reply_markup=main_menu_kb())
 
+async def my_orders_page_callback(callback: types.CallbackQuery):
+    """Handles orders list pagination callbacks."""
+    try:
+        page = int(callback.data.removeprefix("my_orders_page_"))
+        text, kb = await _render_orders_page(callback.from_user.id, page=page)
+        if text is None:
+            await callback.answer("📦 Sizda hali zakazlar yo'q.")
+            return
+        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=kb)
+        await callback.answer()
+    except Exception as e:
+        logger.exception(f"Error in my_orders_page_callback for user {callback.from_user.id}: {e}")
+        await callback.answer("❌ Xato yuz berdi.")
+
 async def cmd_referrals(message: types.Message):
     """Handles the /referrals command to show referral info."""
     try:
-        referrals = get_user_referrals(message.from_user.id)
-        bot_info = await message.bot.get_me()
-        ref_link = f"https://t.me/{bot_info.username}?start=ref_{message.from_user.id}"
-        total_bonus = sum(ref.get('bonus', 0) for ref in referrals)
-        text = (
-            f"👥 Sizning referallaringiz: {len(referrals)} ta\n"
+        # Soni va jami bonus SQL agregatida hisoblanadi - qatorlar faqat ro'yxat uchun olinadi
+        (ref_count, total_bonus), referrals = await asyncio.gather(
+            _db(get_referral_stats, message.from_user.id),
+            _db(get_user_referrals, message.from_user.id),
+        )
+        bot_username = await _get_bot_username(message.bot)
+        ref_link = f"https://t.me/{bot_username}?start=ref_{message.from_user.id}"
+        parts = [
+            f"👥 Sizning referallaringiz: {ref_count} ta\n"
             f"💸 Jami bonus: {total_bonus} so'm\n"
             f"🔗 Referral havolangiz: {ref_link}\n\n"
-        )
+        ]
         if referrals:
-            text += "Referal foydalanuvchilar:\n"
+            parts.append("Referal foydalanuvchilar:\n")
+            # Har bir referal uchun alohida so'rov o'rniga bitta IN so'rovi
+            referred_users = await _db(get_users_bulk, [ref['referred_id'] for ref in referrals])
             for ref in referrals:
-                referred_user = get_user(ref['referred_id'])
+                referred_user = referred_users.get(ref['referred_id'])
                 username = f"@{referred_user['username']}" if referred_user and referred_user.get('username') else f"ID: {ref['referred_id']}"
-                text += f"- {username} (Bonus: {ref['bonus']} so'm)\n"
+                parts.append(f"- {username} (Bonus: {ref['bonus']} so'm)\n")
         else:
-            text += "Hozircha referal foydalanuvchilar yo'q."
+            parts.append("Hozircha referal foydalanuvchilar yo'q.")
+        text = "".join(parts)
 
         kb = InlineKeyboardMarkup().add(InlineKeyboardButton("🏠 Asosiy menyu", callback_data="back_to_main"))
         await message.answer(text, reply_markup=kb)
@@ -188,22 +323,13 @@ async def cmd_referrals(message: types.Message):
 async def process_order(message: types.Message, state: FSMContext):
     """Starts the order process by automatically setting the Yandex Market URL."""
     try:
-        # Predefined Yandex Market URL for wireless headphones M10
-        yandex_market_url = "https://market.yandex.uz/card/besprovodnyye-naushniki-m10/4591765711?do-waremd5=xUwa_LZ8sDvgfu6PoGxQZw&cpc=M-FlYaOgf0DWvjCgIUd8xpU-AGo0-83Sf8wXWhG5qj-6hjPrxABz5Hcv6a-YbnyWIDIYrK-BFpxeRnox88bZWfpygLY_JSdII3rE8HLz3YJVeOMqJ1zlcY-SG8ZEpPFMOMuCdH6OKShCpOuiDeRVWSeE7SnU3gg4UjcjrDc6TGBGuIF9ARq0PWGyNsOGNSGgsPYwfgsu1VnPZva5pBZUzih95szELAdNO9PwsNZvPPnIaa-tAmHT6FTYXkHz4IWLN79xmcvzqX4h28Q5tLa0ZNV3G5faoHFwVJ8gCJkIMbbc5spYxey5sbDBJtJSA-izqGzzKJHHKNLADinX27y0_i6iIKLgLz883el3ZtbpbRYREus0BPf7JEVJSGqCnO_AnomimgEYCpeRGSb7o6S700zxnsOhOiJfj-AI-PVpXdGmAU6hyl7DpKtPmV2QnobvrLU67jh8rtU3_CdkcX-E-hV7NrePTjAYDKH2sLg5XS4rLFY_HN5KuksR1DXudaB-5MnDh-mZ-fjAJzttIAYo4RmFYHQ34O52sUy52xbem-AIGZ0noUk_sLHg5VWLO30h&ogV=-3"
-
         # Set the URL in state data
-        await state.update_data(product_url=yandex_market_url)
+        await state.update_data(product_url=_YANDEX_URL)
 
         # Move to photo state
         await state.set_state(UserStates.waiting_for_photo)
 
-        kb = ReplyKeyboardMarkup(resize_keyboard=True).add(KeyboardButton("🏠 Asosiy menyu"))
-        await message.answer(
-            f"✅ Mahsulot URL avtomatik ravishda o'rnatildi!\n"
-            f"🔗 Mahsulot: {yandex_market_url}\n\n"
-            f"📸 Endi mahsulot skrinshotini yuboring:",
-            reply_markup=kb
-        )
+        await message.answer(_ORDER_PROMPT, reply_markup=_HOME_ONLY_KB)
     except Exception as e:
         logger.exception(f"Error in process_order for user {message.from_user.id}: {e}")
         await message.answer("❌ Zakaz jarayonini boshlashda xato yuz berdi.", reply_markup=main_menu_kb())
@@ -224,19 +350,22 @@ async def process_order_photo(message: types.Message, state: FSMContext):
             await state.finish()
             return
 
+        # Darhol ack yuboramiz - foydalanuvchi DB yozuvini kutib o'tirmaydi
+        placeholder = await message.answer("📥 Zakazingiz qabul qilinmoqda...", reply_markup=main_menu_kb())
+
         # Create order
-        order_id = create_order(
+        order_id = await _db(
+            create_order,
             user_id=message.from_user.id,
             product_url=product_url,
             photo_id=message.photo[-1].file_id
         )
 
-        await message.answer(
+        await placeholder.edit_text(
             f"✅ Zakaz qabul qilindi!\n"
             f"🆔 Zakaz raqami: #{order_id}\n"
             f"📊 Holat: Kutilmoqda\n\n"
-            f"Zakazingiz admin tomonidan tekshiriladi va tasdiqlanadi.",
-            reply_markup=main_menu_kb()
+            f"Zakazingiz admin tomonidan tekshiriladi va tasdiqlanadi."
         )
         await state.finish()
     except Exception as e:
@@ -248,19 +377,14 @@ async def process_withdraw_type(message: types.Message, state: FSMContext):
     """Processes the withdrawal type selection."""
     try:
         withdraw_type = message.text
-        if withdraw_type not in ["💳 Karta", "📱 Telefon", "💰 USDT TRC20"]:
+        if withdraw_type not in _WITHDRAW_TYPES:
             await message.answer("❌ Noto'g'ri tanlov! Iltimos, tugmalardan birini tanlang.")
             return
 
         await state.update_data(withdraw_type=withdraw_type)
         await state.set_state(UserStates.waiting_for_wallet)
-        
-        if withdraw_type == "💳 Karta":
-            await message.answer("💳 Karta raqamini kiriting (16 ta raqam):", reply_markup=ReplyKeyboardRemove())
-        elif withdraw_type == "📱 Telefon":
-            await message.answer("📱 Telefon raqamini kiriting (+998XXXXXXXXX):", reply_markup=ReplyKeyboardRemove())
-        else:  # USDT TRC20
-            await message.answer("💰 USDT TRC20 manzilini kiriting:", reply_markup=ReplyKeyboardRemove())
+
+        await message.answer(_WITHDRAW_VALIDATORS[withdraw_type][2], reply_markup=_REMOVE_KB)
     except Exception as e:
         logger.exception(f"Error in process_withdraw_type for user {message.from_user.id}: {e}")
         await message.answer("❌ Xato yuz berdi.", reply_markup=main_menu_kb())
@@ -273,21 +397,18 @@ async def process_wallet(message: types.Message, state: FSMContext):
         withdraw_type = data.get('withdraw_type')
         wallet = message.text.strip()
 
-        # Validate based on type
-        if withdraw_type == "💳 Karta" and not validate_card_number(wallet):
-            await message.answer("❌ Noto'g'ri karta raqami! 16 ta raqam kiriting.")
-            return
-        elif withdraw_type == "📱 Telefon" and not validate_phone_number(wallet):
-            await message.answer("❌ Noto'g'ri telefon raqami! +998XXXXXXXXX formatida kiriting.")
-            return
-        elif withdraw_type == "💰 USDT TRC20" and not validate_trc20_address(wallet):
-            await message.answer("❌ Noto'g'ri USDT TRC20 manzil! T bilan boshlanuvchi 34 belgili manzil kiriting.")
-            return
+        # Validate based on type (dispatch jadvalidan bitta qidiruv)
+        entry = _WITHDRAW_VALIDATORS.get(withdraw_type)
+        if entry:
+            validator, error_msg, _ = entry
+            if not validator(wallet):
+                await message.answer(error_msg)
+                return
 
         await state.update_data(wallet=wallet)
         await state.set_state(UserStates.waiting_for_withdraw_amount)
         
-        user = get_user(message.from_user.id)
+        user = await _db(get_user, message.from_user.id)
         balance = user.get('balance', 0) if user else 0
         
         await message.answer(
@@ -312,7 +433,7 @@ async def process_withdraw_amount(message: types.Message, state: FSMContext):
             await message.answer("❌ Miqdor 0 dan katta bo'lishi kerak!")
             return
 
-        user = get_user(message.from_user.id)
+        user = await _db(get_user, message.from_user.id)
         balance = user.get('balance', 0) if user else 0
         
         if amount > balance:
@@ -323,21 +444,24 @@ async def process_withdraw_amount(message: types.Message, state: FSMContext):
         withdraw_type = data.get('withdraw_type')
         wallet = data.get('wallet')
 
+        # Darhol ack yuboramiz - foydalanuvchi DB yozuvini kutib o'tirmaydi
+        placeholder = await message.answer("📥 So'rovingiz qabul qilinmoqda...", reply_markup=main_menu_kb())
+
         # Create withdraw request
-        request_id = create_withdraw_request(
+        request_id = await _db(
+            create_withdraw_request,
             user_id=message.from_user.id,
             amount=amount,
             wallet=wallet,
             withdraw_type=withdraw_type
         )
 
-        await message.answer(
+        await placeholder.edit_text(
             f"✅ Yechib olish so'rovi yuborildi!\n"
             f"🆔 So'rov raqami: #{request_id}\n"
             f"💰 Miqdor: {amount} so'm\n"
             f"📊 Holat: Kutilmoqda\n\n"
-            f"So'rovingiz admin tomonidan tekshiriladi.",
-            reply_markup=main_menu_kb()
+            f"So'rovingiz admin tomonidan tekshiriladi."
         )
         await state.finish()
     except Exception as e:
@@ -348,8 +472,9 @@ async def process_withdraw_amount(message: types.Message, state: FSMContext):
 async def cancel_order_callback(callback: types.CallbackQuery):
     """Handles order cancellation."""
     try:
-        order_id = int(callback.data.split("_")[2])
-        db_cancel_order(callback.from_user.id, order_id)
+        # split() ro'yxat ajratadi - removeprefix to'g'ridan-to'g'ri ID qismini qaytaradi
+        order_id = int(callback.data.removeprefix("cancel_order_"))
+        await _db(db_cancel_order, callback.from_user.id, order_id)
         await callback.message.edit_text("✅ Zakaz bekor qilindi.", reply_markup=main_menu_kb())
         await callback.answer()
     except Exception as e:
@@ -360,7 +485,9 @@ async def back_to_main_menu(callback: types.CallbackQuery):
     """Handles back to main menu callback."""
     try:
         await callback.message.edit_text("🏠 Asosiy menyu", reply_markup=None)
-        await callback.bot.send_message(
+        # Menyu xabari navbat orqali ketadi - handler yuborishni kutmaydi
+        outbound.enqueue(
+            callback.bot,
             callback.from_user.id,
             "🏠 Asosiy menyu",
             reply_markup=main_menu_kb()
@@ -380,23 +507,24 @@ async def back_to_main_menu_text(message: types.Message):
 def register_handlers(dp):
     """Registers all message and callback query handlers."""
     # Command handlers
-    dp.register_message_handler(cmd_start, CommandStart(), IsPrivate(), IsNotBlocked())
-    dp.register_message_handler(cmd_balance, Text(equals="💰 Balans"), IsPrivate(), IsNotBlocked())
-    dp.register_message_handler(cmd_my_orders, Text(equals="📦 Mening zakazlarim"), IsPrivate(), IsNotBlocked())
-    dp.register_message_handler(cmd_referrals, Text(equals="👥 Referallar"), IsPrivate(), IsNotBlocked())
+    dp.register_message_handler(cmd_start, CommandStart(), *_PRIVATE_NOT_BLOCKED)
+    dp.register_message_handler(cmd_balance, Text(equals="💰 Balans"), *_PRIVATE_NOT_BLOCKED)
+    dp.register_message_handler(cmd_my_orders, Text(equals="📦 Mening zakazlarim"), *_PRIVATE_NOT_BLOCKED)
+    dp.register_message_handler(cmd_referrals, Text(equals="👥 Referallar"), *_PRIVATE_NOT_BLOCKED)
     
     # Order process handlers
-    dp.register_message_handler(process_order, Text(equals="🛒 Zakaz berish"), IsPrivate(), IsNotBlocked(), state="*")
-    dp.register_message_handler(process_order_photo, IsPrivate(), IsNotBlocked(), state=UserStates.waiting_for_photo, content_types=['photo'])
+    dp.register_message_handler(process_order, Text(equals="🛒 Zakaz berish"), *_PRIVATE_NOT_BLOCKED, state="*")
+    dp.register_message_handler(process_order_photo, *_PRIVATE_NOT_BLOCKED, state=UserStates.waiting_for_photo, content_types=['photo'])
     
     # Withdraw process handlers
-    dp.register_message_handler(process_withdraw_type, Text(equals="💸 Yechib olish"), IsPrivate(), IsNotBlocked(), state="*")
-    dp.register_message_handler(process_wallet, IsPrivate(), IsNotBlocked(), state=UserStates.waiting_for_wallet)
-    dp.register_message_handler(process_withdraw_amount, IsPrivate(), IsNotBlocked(), state=UserStates.waiting_for_withdraw_amount)
+    dp.register_message_handler(process_withdraw_type, Text(equals="💸 Yechib olish"), *_PRIVATE_NOT_BLOCKED, state="*")
+    dp.register_message_handler(process_wallet, *_PRIVATE_NOT_BLOCKED, state=UserStates.waiting_for_wallet)
+    dp.register_message_handler(process_withdraw_amount, *_PRIVATE_NOT_BLOCKED, state=UserStates.waiting_for_withdraw_amount)
     
-    # Callback handlers
-    dp.register_callback_query_handler(cancel_order_callback, lambda c: c.data.startswith("cancel_order_"), state="*")
-    dp.register_callback_query_handler(back_to_main_menu, lambda c: c.data == "back_to_main", state="*")
-    dp.register_message_handler(back_to_main_menu_text, Text(equals="🏠 Asosiy menyu"), IsPrivate(), IsNotBlocked(), state="*")
+    # Callback handlers (aiogram Text filtrlari lambda o'rniga - har update uchun closure chaqirilmaydi)
+    dp.register_callback_query_handler(cancel_order_callback, Text(startswith="cancel_order_"), state="*")
+    dp.register_callback_query_handler(my_orders_page_callback, Text(startswith="my_orders_page_"), state="*")
+    dp.register_callback_query_handler(back_to_main_menu, Text(equals="back_to_main"), state="*")
+    dp.register_message_handler(back_to_main_menu_text, Text(equals="🏠 Asosiy menyu"), *_PRIVATE_NOT_BLOCKED, state="*")
     
     logger.debug("User handlers registered")
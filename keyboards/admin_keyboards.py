@@ -1,5 +1,12 @@
+from functools import lru_cache
+
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
-from database import get_setting, is_user_blocked
+from aiogram.utils.callback_data import CallbackData
+from database import get_settings_snapshot, get_settings_version, is_user_blocked
+
+# Support javob tugmalari uchun callback factory.
+# Support ID ichida "_" bor (SUP_x_y), shuning uchun split("_") o'rniga factory ishlatiladi.
+support_cb = CallbackData("sup", "action", "user_id", "support_id")
 
 # --- HELPER FUNCTION ---
 def _create_inline_kb(buttons: list[tuple[str, str]], row_width: int = 2) -> InlineKeyboardMarkup:
@@ -18,41 +25,49 @@ def _create_inline_kb(buttons: list[tuple[str, str]], row_width: int = 2) -> Inl
     return kb
 
 # --- ADMIN MAIN MENU ---
-def admin_main_menu_kb() -> ReplyKeyboardMarkup:
-    """
-    Creates the main admin menu keyboard.
-    Uses settings from the database for button text.
-    """
+# Sozlamalar versiyasiga bog'lab keshlanadi - sozlama o'zgarmaguncha DB so'rovlari yo'q
+@lru_cache(maxsize=8)
+def _admin_main_menu_kb(version: int) -> ReplyKeyboardMarkup:
+    """Builds the admin main menu keyboard for one settings version."""
+    settings = get_settings_snapshot()
     buttons = [
         [
-            KeyboardButton(text=get_setting("admin_menu_stats") or "📊 Statistika"),
-            KeyboardButton(text=get_setting("admin_menu_export") or "📂 Excel eksport")
+            KeyboardButton(text=settings.get("admin_menu_stats") or "📊 Statistika"),
+            KeyboardButton(text=settings.get("admin_menu_export") or "📂 Excel eksport")
         ],
         [
-            KeyboardButton(text=get_setting("admin_menu_broadcast") or "📨 Xabar yuborish"),
-            KeyboardButton(text=get_setting("admin_menu_user_manage") or "👤 Foydalanuvchi boshqaruvi"),
-            KeyboardButton(text=get_setting("admin_menu_users_list") or "👥 Foydalanuvchilar ro'yxati")
+            KeyboardButton(text=settings.get("admin_menu_broadcast") or "📨 Xabar yuborish"),
+            KeyboardButton(text=settings.get("admin_menu_user_manage") or "👤 Foydalanuvchi boshqaruvi"),
+            KeyboardButton(text=settings.get("admin_menu_users_list") or "👥 Foydalanuvchilar ro'yxati")
         ],
         [
-            KeyboardButton(text=get_setting("admin_menu_orders") or "📦 Zakazlarni boshqarish"),
-            KeyboardButton(text=get_setting("admin_menu_withdraws") or "💸 Pul yechib olish so'rovlari")
+            KeyboardButton(text=settings.get("admin_menu_orders") or "📦 Zakazlarni boshqarish"),
+            KeyboardButton(text=settings.get("admin_menu_withdraws") or "💸 Pul yechib olish so'rovlari")
         ],
         [
-            KeyboardButton(text=get_setting("admin_menu_ad_text") or "📝 Reklama matnini o'zgartirish")
+            KeyboardButton(text=settings.get("admin_menu_ad_text") or "📝 Reklama matnini o'zgartirish")
         ],
         [
-            KeyboardButton(text=get_setting("admin_menu_guide_video") or "📹 Qo'llanma video yuklash")
+            KeyboardButton(text=settings.get("admin_menu_guide_video") or "📹 Qo'llanma video yuklash")
         ],
-        [KeyboardButton(text=get_setting("admin_menu_back") or "🔙 Oddiy menyu")]
+        [KeyboardButton(text=settings.get("admin_menu_back") or "🔙 Oddiy menyu")]
     ]
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True, one_time_keyboard=True)
 
+def admin_main_menu_kb() -> ReplyKeyboardMarkup:
+    """
+    Creates the main admin menu keyboard.
+    Uses settings from the database for button text (cached per settings version).
+    """
+    return _admin_main_menu_kb(get_settings_version())
+
 # --- INLINE KEYBOARDS ---
 
 # Xabar yuborish turini tanlash
+@lru_cache(maxsize=1)
 def broadcast_inline_kb() -> InlineKeyboardMarkup:
     """
-    Creates the broadcast selection keyboard.
+    Creates the broadcast selection keyboard (static, built once).
     """
     buttons = [
         ("📢 Hamma foydalanuvchilarga", "broadcast_all"),
@@ -77,9 +92,10 @@ def user_manage_inline_kb(user_id: int) -> InlineKeyboardMarkup:
     return _create_inline_kb(buttons, row_width=2)
 
 # Reklama matnini o‘zgartirish
+@lru_cache(maxsize=1)
 def ad_text_change_inline_kb() -> InlineKeyboardMarkup:
     """
-    Creates the ad text change keyboard.
+    Creates the ad text change keyboard (static, built once).
     """
     buttons = [
         ("✏️ Matnni o‘zgartirish", "edit_ad_text")
@@ -87,9 +103,10 @@ def ad_text_change_inline_kb() -> InlineKeyboardMarkup:
     return _create_inline_kb(buttons, row_width=2)
 
 # Qo‘llanma video yuklash
+@lru_cache(maxsize=1)
 def guide_video_inline_kb() -> InlineKeyboardMarkup:
     """
-    Creates the guide video upload keyboard.
+    Creates the guide video upload keyboard (static, built once).
     """
     buttons = [
         ("📤 Yangi video yuklash", "upload_guide_video")
@@ -104,16 +121,19 @@ def support_reply_inline_kb(user_id: int, support_id: str = None) -> InlineKeybo
         user_id: ID of the user to reply to.
         support_id: Optional support request ID.
     """
-    callback_data = f"reply_{user_id}_{support_id}" if support_id else f"reply_{user_id}"
+    callback_data = support_cb.new(action="ask", user_id=user_id, support_id=support_id or "-")
     buttons = [
         ("✏️ Javob yozish", callback_data)
     ]
     return _create_inline_kb(buttons, row_width=2)
 
 # --- WITHDRAW MANAGE INLINE KEYBOARD ---
+@lru_cache(maxsize=1024)
 def withdraw_manage_inline_kb(withdraw_id: int) -> InlineKeyboardMarkup:
     """
     Creates the withdraw request management keyboard.
+    Memoized by withdraw_id: the keyboard is pure on its argument, so
+    repeated panel renders reuse the same markup object.
     Args:
         withdraw_id: ID of the withdraw request.
     """
@@ -139,9 +159,10 @@ def broadcast_preview_inline_kb(broadcast_id: int) -> InlineKeyboardMarkup:
     return _create_inline_kb(buttons, row_width=2)
 
 # --- USERS LIST KEYBOARD ---
+@lru_cache(maxsize=1)
 def users_list_inline_kb() -> InlineKeyboardMarkup:
     """
-    Creates the users list keyboard.
+    Creates the users list keyboard (static, built once).
     """
     buttons = [
         ("📋 Barcha foydalanuvchilar", "view_all_users"),
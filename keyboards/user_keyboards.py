@@ -1,5 +1,7 @@
+from functools import lru_cache
+
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
-from database import get_setting, get_user_balance
+from database import get_settings_snapshot, get_settings_version, get_user_balance
 
 # --- HELPER FUNCTION ---
 def _create_inline_kb(buttons: list[tuple[str, str | dict]], row_width: int = 2) -> InlineKeyboardMarkup:
@@ -21,47 +23,62 @@ def _create_inline_kb(buttons: list[tuple[str, str | dict]], row_width: int = 2)
     return kb
 
 # --- USER MAIN MENU ---
-def main_menu_kb() -> ReplyKeyboardMarkup:
-    """
-    Creates the main user menu keyboard.
-    Uses settings from the database for button text.
-    """
+# Klaviaturalar sozlamalar versiyasiga bog'lab keshlanadi: sozlama o'zgarsa
+# versiya oshadi va kesh o'z-o'zidan yangilanadi, aks holda DB so'rovlari bo'lmaydi
+@lru_cache(maxsize=8)
+def _main_menu_kb(version: int) -> ReplyKeyboardMarkup:
+    """Builds the main menu keyboard for one settings version."""
+    settings = get_settings_snapshot()
     buttons = [
         [
-            KeyboardButton(text=get_setting("user_menu_order") or "🛒 Zakaz berish")
+            KeyboardButton(text=settings.get("user_menu_order") or "🛒 Zakaz berish")
         ],
         [
-            KeyboardButton(text=get_setting("user_menu_balance") or "💰 Balans"),
-            KeyboardButton(text=get_setting("user_menu_referrals") or "👥 Referallar")
+            KeyboardButton(text=settings.get("user_menu_balance") or "💰 Balans"),
+            KeyboardButton(text=settings.get("user_menu_referrals") or "👥 Referallar")
         ],
         [
-            KeyboardButton(text=get_setting("user_menu_withdraw") or "💸 Pul yechish"),
-            KeyboardButton(text=get_setting("user_menu_support") or "🆘 Support")
+            KeyboardButton(text=settings.get("user_menu_withdraw") or "💸 Pul yechish"),
+            KeyboardButton(text=settings.get("user_menu_support") or "🆘 Support")
         ],
         [
-            KeyboardButton(text=get_setting("user_menu_withdraw_history") or "📜 Yechib olish tarixi"),
-            KeyboardButton(text=get_setting("user_menu_support_history") or "📋 Support tarixi")
+            KeyboardButton(text=settings.get("user_menu_withdraw_history") or "📜 Yechib olish tarixi"),
+            KeyboardButton(text=settings.get("user_menu_support_history") or "📋 Support tarixi")
         ]
     ]
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True, one_time_keyboard=False)
 
-# --- CANCEL KEYBOARD ---
-def cancel_kb() -> ReplyKeyboardMarkup:
+def main_menu_kb() -> ReplyKeyboardMarkup:
     """
-    Creates the cancel keyboard.
+    Creates the main user menu keyboard.
+    Uses settings from the database for button text (cached per settings version).
     """
+    return _main_menu_kb(get_settings_version())
+
+# --- CANCEL KEYBOARD ---
+@lru_cache(maxsize=8)
+def _cancel_kb(version: int) -> ReplyKeyboardMarkup:
+    """Builds the cancel keyboard for one settings version."""
+    settings = get_settings_snapshot()
     buttons = [
         [
-            KeyboardButton(text=get_setting("cancel_button") or "❌ Bekor qilish"),
-            KeyboardButton(text=get_setting("user_menu_back") or "🏠 Asosiy menyu")
+            KeyboardButton(text=settings.get("cancel_button") or "❌ Bekor qilish"),
+            KeyboardButton(text=settings.get("user_menu_back") or "🏠 Asosiy menyu")
         ]
     ]
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True, one_time_keyboard=True)
 
+def cancel_kb() -> ReplyKeyboardMarkup:
+    """
+    Creates the cancel keyboard (cached per settings version).
+    """
+    return _cancel_kb(get_settings_version())
+
 # --- INLINE TUTORIAL BUTTONS ---
+@lru_cache(maxsize=1)
 def tutorial_inline_kb() -> InlineKeyboardMarkup:
     """
-    Creates the tutorial inline keyboard.
+    Creates the tutorial inline keyboard (static, built once).
     """
     buttons = [
         ("📹 Qo‘llanma videoni ko‘rish", "watch_tutorial"),
@@ -84,35 +101,50 @@ def referral_inline_kb(ref_link: str) -> InlineKeyboardMarkup:
     return _create_inline_kb(buttons, row_width=2)
 
 # --- REFERRAL MENU KEYBOARD ---
+@lru_cache(maxsize=8)
+def _referral_menu_kb(version: int) -> ReplyKeyboardMarkup:
+    """Builds the referral menu keyboard for one settings version."""
+    settings = get_settings_snapshot()
+    buttons = [
+        [KeyboardButton(text=settings.get("user_menu_back") or "🏠 Asosiy menyu")]
+    ]
+    return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True, one_time_keyboard=False)
+
 def referral_menu_kb() -> ReplyKeyboardMarkup:
     """
-    Creates the referral menu keyboard.
+    Creates the referral menu keyboard (cached per settings version).
     """
+    return _referral_menu_kb(get_settings_version())
+
+# --- PAYMENT MENU KEYBOARD ---
+@lru_cache(maxsize=16)
+def _payment_menu_kb(version: int, with_withdraw: bool) -> ReplyKeyboardMarkup:
+    """Builds the payment menu keyboard variant with or without the withdraw button."""
+    settings = get_settings_snapshot()
     buttons = [
-        [KeyboardButton(text=get_setting("user_menu_back") or "🏠 Asosiy menyu")]
+        [KeyboardButton(text=settings.get("user_menu_referrals") or "👥 Referallar")]
     ]
+    if with_withdraw:
+        buttons.insert(0, [KeyboardButton(text=settings.get("user_menu_withdraw") or "💸 Pul yechish")])
+    buttons.append([KeyboardButton(text=settings.get("user_menu_back") or "🏠 Asosiy menyu")])
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True, one_time_keyboard=False)
 
-# --- PAYMENT MENU KEYBOARD ---
 def payment_menu_kb(user_id: int = None) -> ReplyKeyboardMarkup:
     """
     Creates the payment menu keyboard.
-    Dynamically hides the withdraw button if balance is insufficient.
+    Dynamically hides the withdraw button if balance is insufficient; only the
+    balance check stays live, the two keyboard variants are cached.
     Args:
         user_id: Optional user ID to check balance.
     """
-    buttons = [
-        [KeyboardButton(text=get_setting("user_menu_referrals") or "👥 Referallar")]
-    ]
-    if user_id and get_user_balance(user_id) >= 1000:  # Minimal yechib olish summasi 1000 so‘m
-        buttons.insert(0, [KeyboardButton(text=get_setting("user_menu_withdraw") or "💸 Pul yechish")])
-    buttons.append([KeyboardButton(text=get_setting("user_menu_back") or "🏠 Asosiy menyu")])
-    return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True, one_time_keyboard=False)
+    with_withdraw = bool(user_id) and get_user_balance(user_id) >= 1000  # Minimal yechib olish summasi 1000 so‘m
+    return _payment_menu_kb(get_settings_version(), with_withdraw)
 
 # --- WITHDRAW HISTORY KEYBOARD ---
+@lru_cache(maxsize=1)
 def withdraw_history_kb() -> InlineKeyboardMarkup:
     """
-    Creates the withdraw history inline keyboard.
+    Creates the withdraw history inline keyboard (static, built once).
     """
     buttons = [
         ("🔄 Yangilash", "refresh_withdraw_history")
@@ -120,9 +152,10 @@ def withdraw_history_kb() -> InlineKeyboardMarkup:
     return _create_inline_kb(buttons, row_width=2)
 
 # --- SUPPORT HISTORY KEYBOARD ---
+@lru_cache(maxsize=1)
 def support_history_kb() -> InlineKeyboardMarkup:
     """
-    Creates the support history inline keyboard.
+    Creates the support history inline keyboard (static, built once).
     """
     buttons = [
         ("🔄 Yangilash", "refresh_support_history"),
@@ -1,14 +1,47 @@
 import os
+import asyncio
+import time
 import datetime
+import functools
 import pandas as pd
+import numpy as np
 import logging
 import zipfile
+import xlsxwriter
+from xml.sax.saxutils import escape
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from database import get_all_orders, get_all_withdraws, get_all_referrals, save_export, get_user, get_all_users_detailed, get_users_by_date_range
+from database import get_all_orders, get_all_orders_iter, get_all_withdraws, get_all_referrals, save_export, get_users_bulk, get_all_users_detailed, get_users_by_date_range
 
 logger = logging.getLogger(__name__)
 EXPORT_DIR = Path("exports")
 MAX_FILE_AGE_DAYS = 7  # Eski fayllarni o‘chirish uchun limit
+_LARGE_EXPORT_ROWS = 10_000  # Shundan ko'p qatorda xlsxwriter qator-oqim rejimiga o'tadi
+_INLINE_XML_ROWS = 50_000  # Shundan ko'p qatorda sheet XML to'g'ridan-to'g'ri yoziladi
+_WIDTH_SAMPLE_ROWS = 5_000  # Ustun kengligi uchun namuna hajmi (kenglik kosmetik)
+_EXPORT_CACHE_TTL = 300.0  # Bir xil filtrli takroriy eksport shu muddat ichida qayta qurilmaydi
+
+# (export turi, filtrlar, format) -> (fayl yo'li, monotonic vaqt)
+_EXPORT_CACHE: dict = {}
+
+def _cached_export(key: tuple) -> str:
+    """
+    Returns a fresh cached export path for the key, or None.
+    Args:
+        key: Tuple of (export type, filters..., file format).
+    """
+    cached = _EXPORT_CACHE.get(key)
+    if cached:
+        file_path, ts = cached
+        if time.monotonic() - ts < _EXPORT_CACHE_TTL and os.path.exists(file_path):
+            logger.info(f"Returning cached export for {key[0]}: {file_path}")
+            return file_path
+        del _EXPORT_CACHE[key]
+    return None
+
+def _store_export(key: tuple, file_path: str) -> None:
+    """Remembers a freshly written export file for the key."""
+    _EXPORT_CACHE[key] = (file_path, time.monotonic())
 
 def _sanitize_filename(filename: str) -> str:
     """
@@ -16,19 +49,58 @@ def _sanitize_filename(filename: str) -> str:
     """
     return "".join(c for c in filename if c.isalnum() or c in ('.', '_', '-')).strip()
 
+_CLEAN_INTERVAL = 3600.0  # Tozalash har eksportda emas, soatiga bir marta yuritiladi
+_last_clean = -_CLEAN_INTERVAL  # Birinchi chaqiruv har doim ishlashi uchun
+
 def _clean_old_files() -> None:
     """
-    Deletes export files older than MAX_FILE_AGE_DAYS.
+    Deletes export files older than MAX_FILE_AGE_DAYS (at most once per hour).
     """
+    global _last_clean
+    if time.monotonic() - _last_clean < _CLEAN_INTERVAL:
+        return
+    _last_clean = time.monotonic()
     try:
-        cutoff = datetime.datetime.now() - datetime.timedelta(days=MAX_FILE_AGE_DAYS)
-        for file in EXPORT_DIR.glob("*.*"):
-            if file.is_file() and file.stat().st_mtime < cutoff.timestamp():
-                file.unlink()
-                logger.info(f"Deleted old export file: {file}")
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=MAX_FILE_AGE_DAYS)).timestamp()
+        # scandir stat ma'lumotini yozuv bilan birga qaytaradi - fayl boshiga
+        # qo'shimcha syscall yo'q
+        with os.scandir(EXPORT_DIR) as it:
+            for entry in it:
+                if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    logger.info(f"Deleted old export file: {entry.path}")
+        # O'chirilgan fayllarga ishora qiluvchi kesh yozuvlari ham tozalanadi
+        for key, (path, _) in list(_EXPORT_CACHE.items()):
+            if not os.path.exists(path):
+                del _EXPORT_CACHE[key]
     except Exception as e:
         logger.error(f"Failed to clean old files: {e}")
 
+# Sarlavha formati barcha eksportlarda bir xil - spec modul darajasida turadi
+_HEADER_FORMAT_SPEC = {'bold': True, 'bg_color': '#D3D3D3'}
+
+def _set_column_widths(df: pd.DataFrame, worksheet) -> None:
+    """
+    Sets worksheet column widths from a sample of the DataFrame.
+    Args:
+        df: DataFrame whose columns are measured.
+        worksheet: xlsxwriter worksheet object.
+    """
+    # Kenglik butun ustundan emas, namunadan hisoblanadi - katta eksportda
+    # to'liq ustunni str ga aylantirish shart emas
+    sample = df.head(_WIDTH_SAMPLE_ROWS)
+    widths = []
+    for col in df.columns:
+        # .map(len) Python sikli o'rniga uzunliklar numpy C kodida hisoblanadi
+        arr = sample[col].to_numpy(dtype=str)
+        widths.append(max(int(np.char.str_len(arr).max()), len(col)) + 2)
+    # Qo'shni bir xil kengliklar bitta set_column diapazoniga birlashtiriladi
+    start = 0
+    for idx in range(1, len(widths) + 1):
+        if idx == len(widths) or widths[idx] != widths[start]:
+            worksheet.set_column(start, idx - 1, widths[start])
+            start = idx
+
 def _format_excel(df: pd.DataFrame, writer: pd.ExcelWriter) -> None:
     """
     Formats the Excel file (column widths, header styles).
@@ -37,12 +109,209 @@ def _format_excel(df: pd.DataFrame, writer: pd.ExcelWriter) -> None:
         writer: Excel writer object.
     """
     worksheet = writer.sheets['Sheet1']
-    for idx, col in enumerate(df.columns):
-        max_len = max(df[col].astype(str).map(len).max(), len(col)) + 2
-        worksheet.set_column(idx, idx, max_len)
-    header_format = writer.book.add_format({'bold': True, 'bg_color': '#D3D3D3'})
-    for col_num, value in enumerate(df.columns.values):
-        worksheet.write(0, col_num, value, header_format)
+    _set_column_widths(df, worksheet)
+    header_format = writer.book.add_format(_HEADER_FORMAT_SPEC)
+    worksheet.write_row(0, 0, list(df.columns), header_format)
+
+def _write_xlsx_constant_memory(chunks, path: Path) -> int:
+    """
+    Writes DataFrame chunks into one sheet in xlsxwriter's constant_memory mode.
+    Kataklar qator-qator yoziladi: to_excel bu rejimda yaramaydi, chunki u
+    kataklarni ustun-ustun yozadi, constant_memory esa yozib bo'lingan
+    qatorlarga qaytishga yo'l qo'ymaydi.
+    Args:
+        chunks: Iterable of DataFrames with identical columns.
+        path: Destination xlsx path.
+    Returns:
+        Number of data rows written.
+    """
+    rows_written = 0
+    workbook = xlsxwriter.Workbook(str(path), {"constant_memory": True})
+    try:
+        worksheet = workbook.add_worksheet("Sheet1")
+        next_row = 1
+        for df in chunks:
+            if rows_written == 0:
+                # Kengliklar va sarlavha birinchi bo'lakdan, qatorlar oqib
+                # ketmasidan oldin yoziladi
+                _set_column_widths(df, worksheet)
+                header_format = workbook.add_format(_HEADER_FORMAT_SPEC)
+                worksheet.write_row(0, 0, list(df.columns), header_format)
+            # write_row NaN ni rad etadi - yetishmayotgan qiymatlar bo'sh
+            # katak sifatida yoziladi (None -> write_blank)
+            df = df.astype(object).where(df.notna(), None)
+            for row in df.itertuples(index=False, name=None):
+                worksheet.write_row(next_row, 0, row)
+                next_row += 1
+            rows_written += len(df)
+    finally:
+        workbook.close()
+    return rows_written
+
+# Juda katta eksportlar uchun sheet XML to'g'ridan-to'g'ri yoziladi - xlsxwriter
+# ning har katak uchun Python obyekt yo'lini butunlay chetlab o'tadi.
+# Quyidagi statik qismlar minimal yaroqli .xlsx paketini tashkil qiladi.
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_XLSX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+_XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '</styleSheet>'
+)
+
+def _write_xlsx_inline_xml(df: pd.DataFrame, path: Path) -> None:
+    """
+    Writes a DataFrame as xlsx by generating the sheet XML directly.
+    All cells are emitted as inline strings; used only for very large exports
+    where per-cell writer overhead dominates.
+    Args:
+        df: DataFrame to write.
+        path: Destination xlsx path.
+    """
+    def _cell_text(v) -> str:
+        # None/NaN bo'sh katak bo'lib chiqadi - "nan" matni emas
+        if v is None or v != v:
+            return ""
+        return escape(str(v))
+
+    def _row_xml(r: int, values) -> str:
+        cells = "".join(
+            f'<c t="inlineStr"><is><t>{_cell_text(v)}</t></is></c>' for v in values
+        )
+        return f'<row r="{r}">{cells}</row>'
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _XLSX_RELS)
+        zf.writestr("xl/workbook.xml", _XLSX_WORKBOOK)
+        zf.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS)
+        zf.writestr("xl/styles.xml", _XLSX_STYLES)
+        with zf.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            sheet.write(_row_xml(1, df.columns).encode("utf-8"))
+            # Qatorlar 10k bo'laklarda yig'ilib yoziladi - katta df ham bitta
+            # ulkan bayt satriga aylanmaydi
+            buf = []
+            for i, row in enumerate(df.itertuples(index=False, name=None), start=2):
+                buf.append(_row_xml(i, row))
+                if len(buf) >= 10_000:
+                    sheet.write("".join(buf).encode("utf-8"))
+                    buf.clear()
+            if buf:
+                sheet.write("".join(buf).encode("utf-8"))
+            sheet.write(b'</sheetData></worksheet>')
+
+def _write_xlsx_openpyxl_fast(df: pd.DataFrame, path: Path) -> None:
+    """
+    Writes a DataFrame with openpyxl's write-only workbook (low-memory streaming).
+    Args:
+        df: DataFrame to write.
+        path: Destination xlsx path.
+    """
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    try:
+        import lxml  # noqa: F401 - write-only rejim lxml bilan ancha tez
+    except ImportError:
+        logger.warning("lxml o'rnatilmagan - openpyxl write-only rejimi sekinroq ishlaydi")
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    header = []
+    for col in df.columns:
+        cell = WriteOnlyCell(ws, value=col)
+        cell.font = Font(bold=True)
+        header.append(cell)
+    ws.append(header)
+    # Har bir qator darhol vaqtinchalik faylga oqiziladi - RSS o'smaydi
+    for row in df.itertuples(index=False, name=None):
+        ws.append(row)
+    wb.save(path)
+
+def _orders_df(orders: list, users: dict) -> pd.DataFrame:
+    """
+    Builds the export DataFrame for one batch of orders.
+    Args:
+        orders: Order dictionaries.
+        users: Prefetched user dict keyed by user_id.
+    Returns:
+        DataFrame with the export columns.
+    """
+    # Ustun-ustun qurish: har qator uchun dict ajratilmaydi, pandas dtype'ni
+    # tayyor ro'yxatlardan bir yo'la aniqlaydi
+    return pd.DataFrame({
+        "ID": [o["id"] for o in orders],
+        "Foydalanuvchi ID": [o["user_id"] for o in orders],
+        # `or`: NULL qiymat ham (kalit bor, qiymat None) zaxira matnga tushadi
+        "Username": [o.get("username") or "Noma'lum" for o in orders],
+        "Telefon": [users.get(o["user_id"], {}).get("phone") or "Yo‘q" for o in orders],
+        "Rasm ID": [o.get("photo_id") or "Yo‘q" for o in orders],
+        "Status": [o["status"] for o in orders],
+        # strftime har qator uchun emas, butun ustun bo'ylab bir marta chaqiriladi
+        "Sana": pd.to_datetime([o["created_at"] for o in orders]).strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+def _stream_orders_to_xlsx(
+    file_path: Path,
+    start_date: datetime.date = None,
+    end_date: datetime.date = None,
+    user_id: int = None,
+) -> int:
+    """
+    Streams orders from the DB straight into a constant_memory xlsx writer.
+    DB o'qish va yozish bo'lak-bo'lak navbatlashadi - to'liq ro'yxat ham,
+    to'liq DataFrame ham xotirada bir vaqtda turmaydi.
+    Args:
+        file_path: Destination xlsx path.
+        start_date: Optional start date for filtering.
+        end_date: Optional end date for filtering.
+        user_id: Optional user ID for filtering.
+    Returns:
+        Number of data rows written.
+    """
+    def _chunk_frames():
+        for chunk in get_all_orders_iter(start_date, end_date, user_id):
+            users = get_users_bulk(list({o["user_id"] for o in chunk}))
+            yield _orders_df(chunk, users)
+
+    return _write_xlsx_constant_memory(_chunk_frames(), file_path)
 
 def export_orders_excel(
     admin_id: int,
@@ -66,39 +335,53 @@ def export_orders_excel(
         EXPORT_DIR.mkdir(exist_ok=True)
         _clean_old_files()
 
+        # Bir xil filtrli yaqinda yozilgan fayl bo'lsa, qayta qurilmaydi
+        cache_key = ("orders", start_date, end_date, user_id, file_format)
+        cached = _cached_export(cache_key)
+        if cached:
+            # Kesh umumiy bo'lsa ham, har bir adminning eksporti jurnalga tushadi
+            save_export(admin_id, "orders", cached, file_format)
+            return cached
+
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_name = _sanitize_filename(f"orders_{timestamp}_{admin_id}")
+        file_path = EXPORT_DIR / f"{file_name}.{file_format}"
+
+        if file_format == "xlsx" and os.environ.get("EXPORT_BACKEND") != "openpyxl":
+            # DB dan o'qish va diskka yozish bo'lak-bo'lak ustma-ust tushadi
+            rows_written = _stream_orders_to_xlsx(file_path, start_date, end_date, user_id)
+            if not rows_written:
+                file_path.unlink(missing_ok=True)
+                logger.warning("No orders found for export.")
+                raise ValueError("Eksport qilish uchun zakazlar topilmadi.")
+            save_export(admin_id, "orders", str(file_path), file_format)
+            _store_export(cache_key, str(file_path))
+            logger.info(f"Exported orders to {file_path}")
+            return str(file_path)
+
         orders = get_all_orders(start_date, end_date, user_id)
         if not orders:
             logger.warning("No orders found for export.")
             raise ValueError("Eksport qilish uchun zakazlar topilmadi.")
 
-        df = pd.DataFrame([
-            {
-                "ID": o["id"],
-                "Foydalanuvchi ID": o["user_id"],
-                "Username": o.get("username", "Noma'lum"),
-                "Telefon": get_user(o["user_id"]).get("phone", "Yo‘q"),
-                "Rasm ID": o.get("photo_id", "Yo‘q"),
-                "Status": o["status"],
-                "Sana": o["created_at"].strftime("%Y-%m-%d %H:%M:%S")
-            } for o in orders
-        ])
-
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_name = _sanitize_filename(f"orders_{timestamp}_{admin_id}")
-        file_path = EXPORT_DIR / f"{file_name}.{file_format}"
+        # Har bir qator uchun alohida get_user o'rniga bitta IN so'rovi (N+1 yo'q)
+        users = get_users_bulk(list({o["user_id"] for o in orders}))
+        df = _orders_df(orders, users)
 
         if file_format == "xlsx":
-            with pd.ExcelWriter(file_path, engine="xlsxwriter") as writer:
-                df.to_excel(writer, index=False, sheet_name="Sheet1")
-                _format_excel(df, writer)
+            # Operator tanlagan past-xotira backend
+            _write_xlsx_openpyxl_fast(df, file_path)
         elif file_format == "csv":
-            df.to_csv(file_path, index=False, encoding="utf-8")
+            # Chunked yozish oraliq buferlarni chegaralaydi - katta eksport
+            # ham butun matnni xotirada yig'maydi
+            df.to_csv(file_path, index=False, encoding="utf-8", chunksize=10_000, lineterminator="\n")
         elif file_format == "json":
             df.to_json(file_path, orient="records", force_ascii=False)
         else:
             raise ValueError(f"Unsupported file format: {file_format}")
 
         save_export(admin_id, "orders", str(file_path), file_format)
+        _store_export(cache_key, str(file_path))
         logger.info(f"Exported orders to {file_path}")
         return str(file_path)
 
@@ -126,41 +409,63 @@ def export_withdraws_excel(
         EXPORT_DIR.mkdir(exist_ok=True)
         _clean_old_files()
 
+        # Bir xil filtrli yaqinda yozilgan fayl bo'lsa, qayta qurilmaydi
+        cache_key = ("withdraws", start_date, end_date, None, file_format)
+        cached = _cached_export(cache_key)
+        if cached:
+            # Kesh umumiy bo'lsa ham, har bir adminning eksporti jurnalga tushadi
+            save_export(admin_id, "withdraws", cached, file_format)
+            return cached
+
         withdraws = get_all_withdraws(start_date, end_date)
         if not withdraws:
             logger.warning("No withdraw requests found for export.")
             raise ValueError("Eksport qilish uchun yechib olish so‘rovlari topilmadi.")
 
-        df = pd.DataFrame([
-            {
-                "ID": w["id"],
-                "Foydalanuvchi ID": w["user_id"],
-                "Username": get_user(w["user_id"]).get("username", "Noma'lum"),
-                "Telefon": get_user(w["user_id"]).get("phone", "Yo‘q"),
-                "Miqdor": f"{w['amount']:.2f} USDT",
-                "Usul": w.get("withdraw_type", "trc20").capitalize(),
-                "Hamyon/Karta/Telefon": w["wallet"],
-                "Status": w["status"],
-                "Sana": w["created_at"].strftime("%Y-%m-%d %H:%M:%S")
-            } for w in withdraws
-        ])
+        # Foydalanuvchi ma'lumotlari bitta IN so'rovida oldindan olinadi
+        users = get_users_bulk(list({w["user_id"] for w in withdraws}))
+
+        df = pd.DataFrame({
+            "ID": [w["id"] for w in withdraws],
+            "Foydalanuvchi ID": [w["user_id"] for w in withdraws],
+            "Username": [users.get(w["user_id"], {}).get("username", "Noma'lum") for w in withdraws],
+            "Telefon": [users.get(w["user_id"], {}).get("phone", "Yo‘q") for w in withdraws],
+            "Miqdor": [f"{w['amount']:.2f} USDT" for w in withdraws],
+            "Usul": [w.get("withdraw_type", "trc20").capitalize() for w in withdraws],
+            "Hamyon/Karta/Telefon": [w["wallet"] for w in withdraws],
+            "Status": [w["status"] for w in withdraws],
+            "Sana": pd.to_datetime([w["created_at"] for w in withdraws]).strftime("%Y-%m-%d %H:%M:%S"),
+        })
 
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         file_name = _sanitize_filename(f"withdraws_{timestamp}_{admin_id}")
         file_path = EXPORT_DIR / f"{file_name}.{file_format}"
 
         if file_format == "xlsx":
-            with pd.ExcelWriter(file_path, engine="xlsxwriter") as writer:
-                df.to_excel(writer, index=False, sheet_name="Sheet1")
-                _format_excel(df, writer)
+            if os.environ.get("EXPORT_BACKEND") == "openpyxl":
+                # Operator tanlagan past-xotira backend
+                _write_xlsx_openpyxl_fast(df, file_path)
+            elif len(df) > _INLINE_XML_ROWS:
+                # Juda katta eksport: sheet XML to'g'ridan-to'g'ri yoziladi
+                _write_xlsx_inline_xml(df, file_path)
+            elif len(df) > _LARGE_EXPORT_ROWS:
+                # Katta eksportlarda constant_memory qatorlarni darhol diskka oqizadi
+                _write_xlsx_constant_memory([df], file_path)
+            else:
+                with pd.ExcelWriter(file_path, engine="xlsxwriter") as writer:
+                    df.to_excel(writer, index=False, sheet_name="Sheet1")
+                    _format_excel(df, writer)
         elif file_format == "csv":
-            df.to_csv(file_path, index=False, encoding="utf-8")
+            # Chunked yozish oraliq buferlarni chegaralaydi - katta eksport
+            # ham butun matnni xotirada yig'maydi
+            df.to_csv(file_path, index=False, encoding="utf-8", chunksize=10_000, lineterminator="\n")
         elif file_format == "json":
             df.to_json(file_path, orient="records", force_ascii=False)
         else:
             raise ValueError(f"Unsupported file format: {file_format}")
 
         save_export(admin_id, "withdraws", str(file_path), file_format)
+        _store_export(cache_key, str(file_path))
         logger.info(f"Exported withdraws to {file_path}")
         return str(file_path)
 
@@ -188,40 +493,63 @@ def export_referrals_excel(
         EXPORT_DIR.mkdir(exist_ok=True)
         _clean_old_files()
 
+        # Bir xil filtrli yaqinda yozilgan fayl bo'lsa, qayta qurilmaydi
+        cache_key = ("referrals", start_date, end_date, None, file_format)
+        cached = _cached_export(cache_key)
+        if cached:
+            # Kesh umumiy bo'lsa ham, har bir adminning eksporti jurnalga tushadi
+            save_export(admin_id, "referrals", cached, file_format)
+            return cached
+
         referrals = get_all_referrals(start_date, end_date)
         if not referrals:
             logger.warning("No referrals found for export.")
             raise ValueError("Eksport qilish uchun referallar topilmadi.")
 
-        df = pd.DataFrame([
-            {
-                "Referrer ID": r["referrer_id"],
-                "Referrer Username": get_user(r["referrer_id"]).get("username", "Noma'lum"),
-                "Referrer Telefon": get_user(r["referrer_id"]).get("phone", "Yo‘q"),
-                "Referred ID": r["referred_id"],
-                "Referred Username": get_user(r["referred_id"]).get("username", "Noma'lum"),
-                "Bonus": f"{r['bonus']:.2f} USDT",
-                "Daraja": r.get("level", 1),
-                "Sana": r["created_at"].strftime("%Y-%m-%d %H:%M:%S")
-            } for r in referrals
-        ])
+        # Referrer va referred IDlar birlashtirilib bitta IN so'rovida olinadi
+        ids = {r["referrer_id"] for r in referrals} | {r["referred_id"] for r in referrals}
+        users = get_users_bulk(list(ids))
+
+        df = pd.DataFrame({
+            "Referrer ID": [r["referrer_id"] for r in referrals],
+            "Referrer Username": [users.get(r["referrer_id"], {}).get("username", "Noma'lum") for r in referrals],
+            "Referrer Telefon": [users.get(r["referrer_id"], {}).get("phone", "Yo‘q") for r in referrals],
+            "Referred ID": [r["referred_id"] for r in referrals],
+            "Referred Username": [users.get(r["referred_id"], {}).get("username", "Noma'lum") for r in referrals],
+            "Bonus": [f"{r['bonus']:.2f} USDT" for r in referrals],
+            "Daraja": [r.get("level", 1) for r in referrals],
+            "Sana": pd.to_datetime([r["created_at"] for r in referrals]).strftime("%Y-%m-%d %H:%M:%S"),
+        })
 
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         file_name = _sanitize_filename(f"referrals_{timestamp}_{admin_id}")
         file_path = EXPORT_DIR / f"{file_name}.{file_format}"
 
         if file_format == "xlsx":
-            with pd.ExcelWriter(file_path, engine="xlsxwriter") as writer:
-                df.to_excel(writer, index=False, sheet_name="Sheet1")
-                _format_excel(df, writer)
+            if os.environ.get("EXPORT_BACKEND") == "openpyxl":
+                # Operator tanlagan past-xotira backend
+                _write_xlsx_openpyxl_fast(df, file_path)
+            elif len(df) > _INLINE_XML_ROWS:
+                # Juda katta eksport: sheet XML to'g'ridan-to'g'ri yoziladi
+                _write_xlsx_inline_xml(df, file_path)
+            elif len(df) > _LARGE_EXPORT_ROWS:
+                # Katta eksportlarda constant_memory qatorlarni darhol diskka oqizadi
+                _write_xlsx_constant_memory([df], file_path)
+            else:
+                with pd.ExcelWriter(file_path, engine="xlsxwriter") as writer:
+                    df.to_excel(writer, index=False, sheet_name="Sheet1")
+                    _format_excel(df, writer)
         elif file_format == "csv":
-            df.to_csv(file_path, index=False, encoding="utf-8")
+            # Chunked yozish oraliq buferlarni chegaralaydi - katta eksport
+            # ham butun matnni xotirada yig'maydi
+            df.to_csv(file_path, index=False, encoding="utf-8", chunksize=10_000, lineterminator="\n")
         elif file_format == "json":
             df.to_json(file_path, orient="records", force_ascii=False)
         else:
             raise ValueError(f"Unsupported file format: {file_format}")
 
         save_export(admin_id, "referrals", str(file_path), file_format)
+        _store_export(cache_key, str(file_path))
         logger.info(f"Exported referrals to {file_path}")
         return str(file_path)
 
@@ -245,11 +573,21 @@ def export_to_zip(admin_id: int, file_paths: list[str], password: str = None) ->
         zip_name = _sanitize_filename(f"export_{timestamp}_{admin_id}.zip")
         zip_path = EXPORT_DIR / zip_name
 
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        # Fayllar parallel o'qiladi (I/O GILni qo'yib yuboradi); xlsx/zip
+        # allaqachon siqilgan - ularni qayta deflate qilish behuda CPU
+        with ThreadPoolExecutor() as pool:
+            blobs = list(pool.map(lambda p: Path(p).read_bytes(), file_paths))
+
+        with zipfile.ZipFile(zip_path, "w") as zf:
             if password:
                 zf.setpassword(password.encode("utf-8"))
-            for file_path in file_paths:
-                zf.write(file_path, os.path.basename(file_path))
+            for file_path, blob in zip(file_paths, blobs):
+                name = os.path.basename(file_path)
+                if name.endswith((".xlsx", ".zip")):
+                    zf.writestr(name, blob, compress_type=zipfile.ZIP_STORED)
+                else:
+                    # Matnli formatlar uchun past daraja yetarli va ancha tez
+                    zf.writestr(name, blob, compress_type=zipfile.ZIP_DEFLATED, compresslevel=1)
 
         logger.info(f"Created ZIP archive: {zip_path}")
         return str(zip_path)
@@ -278,6 +616,14 @@ def export_users_excel(
         EXPORT_DIR.mkdir(exist_ok=True)
         _clean_old_files()
 
+        # Bir xil filtrli yaqinda yozilgan fayl bo'lsa, qayta qurilmaydi
+        cache_key = ("users", start_date, end_date, None, file_format)
+        cached = _cached_export(cache_key)
+        if cached:
+            # Kesh umumiy bo'lsa ham, har bir adminning eksporti jurnalga tushadi
+            save_export(admin_id, "users", cached, file_format)
+            return cached
+
         if start_date or end_date:
             users = get_users_by_date_range(start_date, end_date)
         else:
@@ -287,37 +633,73 @@ def export_users_excel(
             logger.warning("No users found for export.")
             raise ValueError("Eksport qilish uchun foydalanuvchilar topilmadi.")
 
-        df = pd.DataFrame([
-            {
-                "ID": u["user_id"],
-                "Username": u.get("username", "Yo'q"),
-                "Telefon": u.get("phone", "Yo'q"),
-                "Balans": f"{u['balance']:.2f} so'm",
-                "Status": "Bloklangan" if u['is_blocked'] else "Faol",
-                "Referrer ID": u.get("referred_by", "Yo'q"),
-                "Ro'yxatdan o'tgan sana": u["created_at"].strftime("%Y-%m-%d %H:%M:%S")
-            } for u in users
-        ])
+        df = pd.DataFrame({
+            "ID": [u["user_id"] for u in users],
+            "Username": [u.get("username", "Yo'q") for u in users],
+            "Telefon": [u.get("phone", "Yo'q") for u in users],
+            "Balans": [f"{u['balance']:.2f} so'm" for u in users],
+            "Status": ["Bloklangan" if u['is_blocked'] else "Faol" for u in users],
+            "Referrer ID": [u.get("referred_by", "Yo'q") for u in users],
+            "Ro'yxatdan o'tgan sana": pd.to_datetime([u["created_at"] for u in users]).strftime("%Y-%m-%d %H:%M:%S"),
+        })
 
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         file_name = _sanitize_filename(f"users_{timestamp}_{admin_id}")
         file_path = EXPORT_DIR / f"{file_name}.{file_format}"
 
         if file_format == "xlsx":
-            with pd.ExcelWriter(file_path, engine="xlsxwriter") as writer:
-                df.to_excel(writer, index=False, sheet_name="Sheet1")
-                _format_excel(df, writer)
+            if os.environ.get("EXPORT_BACKEND") == "openpyxl":
+                # Operator tanlagan past-xotira backend
+                _write_xlsx_openpyxl_fast(df, file_path)
+            elif len(df) > _INLINE_XML_ROWS:
+                # Juda katta eksport: sheet XML to'g'ridan-to'g'ri yoziladi
+                _write_xlsx_inline_xml(df, file_path)
+            elif len(df) > _LARGE_EXPORT_ROWS:
+                # Katta eksportlarda constant_memory qatorlarni darhol diskka oqizadi
+                _write_xlsx_constant_memory([df], file_path)
+            else:
+                with pd.ExcelWriter(file_path, engine="xlsxwriter") as writer:
+                    df.to_excel(writer, index=False, sheet_name="Sheet1")
+                    _format_excel(df, writer)
         elif file_format == "csv":
-            df.to_csv(file_path, index=False, encoding="utf-8")
+            # Chunked yozish oraliq buferlarni chegaralaydi - katta eksport
+            # ham butun matnni xotirada yig'maydi
+            df.to_csv(file_path, index=False, encoding="utf-8", chunksize=10_000, lineterminator="\n")
         elif file_format == "json":
             df.to_json(file_path, orient="records", force_ascii=False)
         else:
             raise ValueError(f"Unsupported file format: {file_format}")
 
         save_export(admin_id, "users", str(file_path), file_format)
+        _store_export(cache_key, str(file_path))
         logger.info(f"Exported users to {file_path}")
         return str(file_path)
 
     except Exception as e:
         logger.error(f"Failed to export users: {e}")
-        raise
\ No newline at end of file
+        raise
+# --- ASYNC WRAPPERS ---
+# Eksport yozuvi daqiqalab davom etishi mumkin - handlerlar event loopni
+# bloklamasligi uchun alohida kichik poolda bajariladi
+_EXPORT_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="export")
+
+async def _run_export(fn, *args, **kwargs) -> str:
+    """Runs a synchronous exporter in the export thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_EXPORT_POOL, functools.partial(fn, *args, **kwargs))
+
+async def export_orders_excel_async(*args, **kwargs) -> str:
+    """Async wrapper around export_orders_excel."""
+    return await _run_export(export_orders_excel, *args, **kwargs)
+
+async def export_withdraws_excel_async(*args, **kwargs) -> str:
+    """Async wrapper around export_withdraws_excel."""
+    return await _run_export(export_withdraws_excel, *args, **kwargs)
+
+async def export_referrals_excel_async(*args, **kwargs) -> str:
+    """Async wrapper around export_referrals_excel."""
+    return await _run_export(export_referrals_excel, *args, **kwargs)
+
+async def export_users_excel_async(*args, **kwargs) -> str:
+    """Async wrapper around export_users_excel."""
+    return await _run_export(export_users_excel, *args, **kwargs)
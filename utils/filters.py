@@ -1,4 +1,5 @@
 import logging
+import time
 from typing import Union
 from aiogram import types
 from aiogram.dispatcher.filters import BoundFilter
@@ -6,6 +7,52 @@ from database import is_user_blocked, is_admin, user_exists, get_user_balance
 
 logger = logging.getLogger(__name__)
 
+_FILTER_CACHE_TTL = 30.0  # Filtr DB natijalari shu muddat keshlanadi
+_FILTER_CACHE_MAX = 4096  # Kesh hajmi chegarasi - har alohida foydalanuvchiga o'sib ketmasligi uchun
+
+# user_id -> (monotonic vaqt, qiymat) - sergap foydalanuvchi har update uchun
+# bir xil SELECTlarni qayta yubormasligi uchun
+_admin_cache: dict = {}
+_blocked_cache: dict = {}
+_exists_cache: dict = {}
+
+def _cached_check(cache: dict, fn, user_id: int) -> bool:
+    """
+    Returns the cached result of fn(user_id), refreshing it after the TTL.
+    The cache is capped at _FILTER_CACHE_MAX entries: expired entries are
+    swept on overflow, then the oldest are dropped if it is still full.
+    Args:
+        cache: Per-check cache dict.
+        fn: Database predicate to call on a miss.
+        user_id: Telegram user ID.
+    """
+    now = time.monotonic()
+    entry = cache.get(user_id)
+    if entry is not None and now - entry[0] < _FILTER_CACHE_TTL:
+        return entry[1]
+    value = fn(user_id)
+    if len(cache) >= _FILTER_CACHE_MAX:
+        for uid, (ts, _) in list(cache.items()):
+            if now - ts >= _FILTER_CACHE_TTL:
+                del cache[uid]
+        # dict kiritish tartibida - bosh tomondagi yozuvlar eng eskilari
+        while len(cache) >= _FILTER_CACHE_MAX:
+            cache.pop(next(iter(cache)))
+    cache[user_id] = (now, value)
+    return value
+
+def invalidate_user_filters(user_id: int) -> None:
+    """
+    Drops cached filter results for one user.
+    Called from write paths (block/unblock, admin changes) so the new status
+    takes effect immediately instead of after the TTL.
+    Args:
+        user_id: Telegram user ID.
+    """
+    _admin_cache.pop(user_id, None)
+    _blocked_cache.pop(user_id, None)
+    _exists_cache.pop(user_id, None)
+
 class IsPrivate(BoundFilter):
     """
     Filter to check if the message is sent in a private chat.
@@ -27,7 +74,7 @@ class IsNotBlocked(BoundFilter):
     async def check(self, message: types.Message) -> bool:
         try:
             user_id = message.from_user.id
-            is_blocked = is_user_blocked(user_id)
+            is_blocked = _cached_check(_blocked_cache, is_user_blocked, user_id)
             if is_blocked:
                 logger.debug(f"Blocked user {user_id} attempted to interact")
                 await message.answer(
@@ -50,7 +97,7 @@ class IsAdmin(BoundFilter):
     async def check(self, message: types.Message) -> bool:
         try:
             user_id = message.from_user.id
-            is_admin_user = is_admin(user_id)
+            is_admin_user = _cached_check(_admin_cache, is_admin, user_id)
             if not is_admin_user:
                 logger.debug(f"Non-admin user {user_id} attempted admin action")
                 await message.answer(
@@ -73,7 +120,7 @@ class IsRegistered(BoundFilter):
     async def check(self, message: types.Message) -> bool:
         try:
             user_id = message.from_user.id
-            exists = user_exists(user_id)
+            exists = _cached_check(_exists_cache, user_exists, user_id)
             if not exists:
                 logger.debug(f"Unregistered user {user_id} attempted action")
                 await message.answer(
@@ -133,6 +180,20 @@ class IsGroup(BoundFilter):
         return is_group
 
 # Callback Query Filters
+class CallbackPrefixFilter(BoundFilter):
+    """
+    Filter that matches callback data by a fixed prefix.
+    Created once at registration time, so no lambda closure is allocated
+    and evaluated per callback query.
+    Args:
+        prefix: Callback data prefix to match.
+    """
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+
+    async def check(self, callback: types.CallbackQuery) -> bool:
+        return callback.data.startswith(self.prefix)
+
 class IsPrivateCallback(BoundFilter):
     """
     Filter to check if the callback query is from a private chat.
@@ -151,7 +212,7 @@ class IsNotBlockedCallback(BoundFilter):
     async def check(self, callback: types.CallbackQuery) -> bool:
         try:
             user_id = callback.from_user.id
-            is_blocked = is_user_blocked(user_id)
+            is_blocked = _cached_check(_blocked_cache, is_user_blocked, user_id)
             if is_blocked:
                 logger.debug(f"Blocked user {user_id} attempted callback interaction")
                 await callback.answer("🚫 Siz botdan foydalana olmaysiz, chunki bloklangansiz.")
@@ -168,7 +229,7 @@ class IsAdminCallback(BoundFilter):
     async def check(self, callback: types.CallbackQuery) -> bool:
         try:
             user_id = callback.from_user.id
-            is_admin_user = is_admin(user_id)
+            is_admin_user = _cached_check(_admin_cache, is_admin, user_id)
             if not is_admin_user:
                 logger.debug(f"Non-admin user {user_id} attempted admin callback")
                 await callback.answer("❌ Siz admin emassiz!")
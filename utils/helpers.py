@@ -1,5 +1,8 @@
 import logging
 import asyncio
+import re
+import time
+from collections import defaultdict
 from typing import Any, Union, Optional
 from aiogram import Bot
 from aiogram.utils.exceptions import BotBlocked, UserDeactivated, TelegramAPIError
@@ -8,6 +11,60 @@ from database import update_export_message_stats
 logger = logging.getLogger(__name__)
 
 MAX_MESSAGE_LENGTH = 4096  # Telegram matn uzunligi cheklovi
+_BATCH_CONCURRENCY = 25  # Bir vaqtda parvozda bo'ladigan yuborishlar soni
+_BATCH_RATE_PER_SEC = 29  # Telegram global limiti 30 msg/s - ozgina zaxira bilan
+
+# Global token bucket - parallel yuborishlar ham umumiy 29 msg/s dan oshmaydi
+_rate_lock = asyncio.Lock()
+_rate_tokens = float(_BATCH_RATE_PER_SEC)
+_rate_updated = time.monotonic()
+
+_STATS_FLUSH_EVERY = 500  # Shuncha yuborishdan keyin statistika DB ga yoziladi
+
+# export_id -> [sent, failed] - har yuborishda UPDATE o'rniga xotirada yig'iladi
+_STATS_BUFFER: dict = defaultdict(lambda: [0, 0])
+
+def _bump_stats(export_id: int, sent: int = 0, failed: int = 0) -> None:
+    """
+    Accumulates send statistics in memory, flushing to the DB every
+    _STATS_FLUSH_EVERY messages instead of once per send.
+    Args:
+        export_id: Export/broadcast ID.
+        sent: Number of successful sends to add.
+        failed: Number of failed sends to add.
+    """
+    counters = _STATS_BUFFER[export_id]
+    counters[0] += sent
+    counters[1] += failed
+    if counters[0] + counters[1] >= _STATS_FLUSH_EVERY:
+        _flush_stats(export_id)
+
+def _flush_stats(export_id: int) -> None:
+    """Writes buffered statistics for one export to the DB and resets them."""
+    counters = _STATS_BUFFER.pop(export_id, None)
+    if counters and (counters[0] or counters[1]):
+        update_export_message_stats(export_id, sent=counters[0], failed=counters[1])
+
+async def _take_send_token() -> None:
+    """Waits until the global token bucket allows one more send."""
+    global _rate_tokens, _rate_updated
+    while True:
+        async with _rate_lock:
+            now = time.monotonic()
+            _rate_tokens = min(
+                float(_BATCH_RATE_PER_SEC),
+                _rate_tokens + (now - _rate_updated) * _BATCH_RATE_PER_SEC,
+            )
+            _rate_updated = now
+            if _rate_tokens >= 1.0:
+                _rate_tokens -= 1.0
+                return
+            wait = (1.0 - _rate_tokens) / _BATCH_RATE_PER_SEC
+        await asyncio.sleep(wait)
+
+# Ikki marta replace() o'rniga bitta o'tishda ishlaydi va <SCRIPT>, <script src=...>
+# kabi variantlarni ham ushlaydi
+_SCRIPT_RE = re.compile(r"</?script\b[^>]*>", re.IGNORECASE)
 
 def _sanitize_text(text: str) -> str:
     """
@@ -19,14 +76,14 @@ def _sanitize_text(text: str) -> str:
     """
     if not text:
         return ""
-    text = text.strip()[:MAX_MESSAGE_LENGTH]
-    return text.replace("<script>", "").replace("</script>", "")  # Oddiy tozalash, bleach ishlatish mumkin
+    return _SCRIPT_RE.sub("", text.strip()[:MAX_MESSAGE_LENGTH])
 
 async def bot_send_safe(
     bot: Bot,
     user_id: int,
     text: str = "",
     export_id: Optional[int] = None,
+    _sanitized: bool = False,
     **kwargs: Any
 ) -> bool:
     """
@@ -36,33 +93,35 @@ async def bot_send_safe(
         user_id: Telegram user ID.
         text: Message text to send (optional if reply_markup is provided).
         export_id: Optional export/broadcast ID for statistics tracking.
+        _sanitized: Internal flag - True when the caller already sanitized text.
         **kwargs: Additional parameters for send_message (e.g., parse_mode, reply_markup).
     Returns:
         True if message was sent successfully, False otherwise.
     """
     try:
-        text = _sanitize_text(text)
+        if not _sanitized:
+            text = _sanitize_text(text)
         if text or kwargs.get("reply_markup") is not None:
             await bot.send_message(user_id, text or " ", **kwargs)
             if export_id:
-                update_export_message_stats(export_id, sent=1, failed=0)
+                _bump_stats(export_id, sent=1)
             logger.debug(f"Message sent to user {user_id}")
             return True
         return False
     except (BotBlocked, UserDeactivated) as e:
         logger.debug(f"Failed to send message to {user_id}: {e}")
         if export_id:
-            update_export_message_stats(export_id, sent=0, failed=1)
+            _bump_stats(export_id, failed=1)
         return False
     except TelegramAPIError as e:
         logger.error(f"Telegram API error sending message to {user_id}: {e}")
         if export_id:
-            update_export_message_stats(export_id, sent=0, failed=1)
+            _bump_stats(export_id, failed=1)
         return False
     except Exception as e:
         logger.error(f"Unexpected error sending message to {user_id}: {e}")
         if export_id:
-            update_export_message_stats(export_id, sent=0, failed=1)
+            _bump_stats(export_id, failed=1)
         return False
 
 async def bot_send_photo_safe(
@@ -89,23 +148,23 @@ async def bot_send_photo_safe(
         caption = _sanitize_text(caption)
         await bot.send_photo(user_id, photo, caption=caption, **kwargs)
         if export_id:
-            update_export_message_stats(export_id, sent=1, failed=0)
+            _bump_stats(export_id, sent=1)
         logger.debug(f"Photo sent to user {user_id}")
         return True
     except (BotBlocked, UserDeactivated) as e:
         logger.debug(f"Failed to send photo to {user_id}: {e}")
         if export_id:
-            update_export_message_stats(export_id, sent=0, failed=1)
+            _bump_stats(export_id, failed=1)
         return False
     except TelegramAPIError as e:
         logger.error(f"Telegram API error sending photo to {user_id}: {e}")
         if export_id:
-            update_export_message_stats(export_id, sent=0, failed=1)
+            _bump_stats(export_id, failed=1)
         return False
     except Exception as e:
         logger.error(f"Unexpected error sending photo to {user_id}: {e}")
         if export_id:
-            update_export_message_stats(export_id, sent=0, failed=1)
+            _bump_stats(export_id, failed=1)
         return False
 
 async def bot_send_video_safe(
@@ -132,23 +191,23 @@ async def bot_send_video_safe(
         caption = _sanitize_text(caption)
         await bot.send_video(user_id, video, caption=caption, **kwargs)
         if export_id:
-            update_export_message_stats(export_id, sent=1, failed=0)
+            _bump_stats(export_id, sent=1)
         logger.debug(f"Video sent to user {user_id}")
         return True
     except (BotBlocked, UserDeactivated) as e:
         logger.debug(f"Failed to send video to {user_id}: {e}")
         if export_id:
-            update_export_message_stats(export_id, sent=0, failed=1)
+            _bump_stats(export_id, failed=1)
         return False
     except TelegramAPIError as e:
         logger.error(f"Telegram API error sending video to {user_id}: {e}")
         if export_id:
-            update_export_message_stats(export_id, sent=0, failed=1)
+            _bump_stats(export_id, failed=1)
         return False
     except Exception as e:
         logger.error(f"Unexpected error sending video to {user_id}: {e}")
         if export_id:
-            update_export_message_stats(export_id, sent=0, failed=1)
+            _bump_stats(export_id, failed=1)
         return False
 
 async def bot_send_document_safe(
@@ -175,23 +234,23 @@ async def bot_send_document_safe(
         caption = _sanitize_text(caption)
         await bot.send_document(user_id, document, caption=caption, **kwargs)
         if export_id:
-            update_export_message_stats(export_id, sent=1, failed=0)
+            _bump_stats(export_id, sent=1)
         logger.debug(f"Document sent to user {user_id}")
         return True
     except (BotBlocked, UserDeactivated) as e:
         logger.debug(f"Failed to send document to {user_id}: {e}")
         if export_id:
-            update_export_message_stats(export_id, sent=0, failed=1)
+            _bump_stats(export_id, failed=1)
         return False
     except TelegramAPIError as e:
         logger.error(f"Telegram API error sending document to {user_id}: {e}")
         if export_id:
-            update_export_message_stats(export_id, sent=0, failed=1)
+            _bump_stats(export_id, failed=1)
         return False
     except Exception as e:
         logger.error(f"Unexpected error sending document to {user_id}: {e}")
         if export_id:
-            update_export_message_stats(export_id, sent=0, failed=1)
+            _bump_stats(export_id, failed=1)
         return False
 
 async def bot_send_batch_safe(
@@ -199,32 +258,37 @@ async def bot_send_batch_safe(
     user_ids: list[int],
     text: str = "",
     export_id: Optional[int] = None,
-    rate_limit_delay: float = 0.05,
     **kwargs: Any
 ) -> tuple[int, int]:
     """
     Sends a batch of messages to multiple users with rate limiting.
+    Sends run concurrently (network RTTlar ustma-ust tushadi), the shared
+    token bucket keeps the total under Telegram's global limit.
     Args:
         bot: Aiogram Bot instance.
         user_ids: List of user IDs to send messages to.
         text: Message text to send (optional if reply_markup is provided).
         export_id: Optional export/broadcast ID for statistics tracking.
-        rate_limit_delay: Delay between messages to avoid Telegram API limits.
         **kwargs: Additional parameters for send_message (e.g., parse_mode, reply_markup).
     Returns:
         Tuple of (sent_count, failed_count).
     """
-    sent_count = 0
-    failed_count = 0
+    # Matn bir marta tozalanadi - bot_send_safe ichida qayta skan qilinmaydi
     text = _sanitize_text(text)
+    sem = asyncio.Semaphore(_BATCH_CONCURRENCY)
+
+    async def _send_one(user_id: int) -> bool:
+        async with sem:
+            await _take_send_token()
+            return await bot_send_safe(bot, user_id, text, export_id, _sanitized=True, **kwargs)
+
+    results = await asyncio.gather(*(_send_one(uid) for uid in user_ids), return_exceptions=True)
+    sent_count = sum(1 for r in results if r is True)
+    failed_count = len(user_ids) - sent_count
 
-    for user_id in user_ids:
-        success = await bot_send_safe(bot, user_id, text, export_id, **kwargs)
-        if success:
-            sent_count += 1
-        else:
-            failed_count += 1
-        await asyncio.sleep(rate_limit_delay)  # Telegram API rate limitlaridan qochish
+    # Buferda qolgan statistika partiya oxirida yoziladi
+    if export_id:
+        _flush_stats(export_id)
 
     logger.info(f"Batch send completed: {sent_count} sent, {failed_count} failed")
     return sent_count, failed_count
\ No newline at end of file
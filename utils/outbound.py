@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.utils.exceptions import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Telegram global limiti 30 msg/s - bir oz pastroq ushlab Retry-After dan qochamiz
+_RATE_PER_SEC = 29
+_WORKER_IDLE_TIMEOUT = 60.0
+_QUEUE_MAXSIZE = 1000  # Bitta chat navbatining chegarasi - to'lsa xabar tashlanadi
+
+class OutboundQueue:
+    """
+    Bounded outgoing-message queue.
+
+    Messages for the same chat go through one FIFO queue so ordering is
+    preserved, different chats send concurrently, and a token bucket keeps
+    the total rate under Telegram's global limit. Handlers enqueue and
+    return immediately instead of awaiting the network send. Each chat's
+    queue holds at most _QUEUE_MAXSIZE messages; past that, new messages
+    are dropped with a warning instead of buffering without limit.
+    """
+
+    def __init__(self, rate_per_sec: int = _RATE_PER_SEC):
+        self._rate = rate_per_sec
+        self._tokens = float(rate_per_sec)
+        self._last_refill = time.monotonic()
+        self._token_lock = asyncio.Lock()
+        self._chat_queues: dict = {}
+        self._chat_workers: dict = {}
+
+    async def _take_token(self) -> None:
+        """Blocks until a send token is available (token bucket refill)."""
+        async with self._token_lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(float(self._rate), self._tokens + (now - self._last_refill) * self._rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+    async def _chat_worker(self, chat_id: int) -> None:
+        """Drains one chat's queue in order, then exits when idle."""
+        queue = self._chat_queues[chat_id]
+        while True:
+            try:
+                bot, text, kwargs = await asyncio.wait_for(queue.get(), timeout=_WORKER_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                if queue.empty():
+                    self._chat_workers.pop(chat_id, None)
+                    self._chat_queues.pop(chat_id, None)
+                    return
+                continue
+            await self._take_token()
+            try:
+                await bot.send_message(chat_id, text, **kwargs)
+            except RetryAfter as e:
+                # Flood limit - xabar tashlanmaydi, kutib bir marta qayta uriniladi
+                logger.warning(f"Flood limit for chat {chat_id}, retrying in {e.timeout}s")
+                await asyncio.sleep(e.timeout)
+                try:
+                    await bot.send_message(chat_id, text, **kwargs)
+                except Exception as e2:
+                    logger.warning(f"Outbound send to chat {chat_id} failed after retry: {e2}")
+            except Exception as e:
+                logger.warning(f"Outbound send to chat {chat_id} failed: {e}")
+            finally:
+                queue.task_done()
+
+    def enqueue(self, bot: Bot, chat_id: int, text: str, **kwargs) -> None:
+        """
+        Queues a message for delivery and returns immediately.
+        Args:
+            bot: Telegram Bot instance.
+            chat_id: Target chat ID.
+            kwargs: Extra send_message arguments (reply_markup, parse_mode, ...).
+        """
+        queue = self._chat_queues.get(chat_id)
+        if queue is None:
+            queue = asyncio.Queue(maxsize=_QUEUE_MAXSIZE)
+            self._chat_queues[chat_id] = queue
+        try:
+            queue.put_nowait((bot, text, kwargs))
+        except asyncio.QueueFull:
+            # Token bucket 29 msg/s dan tez bo'shamaydi - limitdan ortig'ini
+            # xotirada to'plagandan ko'ra tashlab, ogohlantirish yaxshiroq
+            logger.warning(f"Outbound queue full for chat {chat_id}, dropping message")
+            return
+        worker = self._chat_workers.get(chat_id)
+        if worker is None or worker.done():
+            self._chat_workers[chat_id] = asyncio.create_task(self._chat_worker(chat_id))
+
+# Umumiy navbat - barcha handlerlar shu instansiyadan foydalanadi
+outbound = OutboundQueue()
@@ -0,0 +1,37 @@
+import time
+import threading
+from typing import Optional
+
+from database import get_setting
+
+# Sozlamalar kam o'zgaradi - qisqa TTL bilan keshlab, har so'rovda DB ga murojaat qilmaymiz
+_DEFAULT_TTL = 60.0
+_cache: dict = {}
+_lock = threading.Lock()
+
+def cached_setting(key: str, ttl: float = _DEFAULT_TTL) -> Optional[str]:
+    """
+    Returns a setting value, caching it for a short time.
+    Args:
+        key: Setting key.
+        ttl: Cache lifetime in seconds.
+    Returns:
+        Setting value or None if not set.
+    """
+    now = time.monotonic()
+    entry = _cache.get(key)
+    if entry and now - entry[0] < ttl:
+        return entry[1]
+    value = get_setting(key)
+    with _lock:
+        _cache[key] = (now, value)
+    return value
+
+def invalidate_setting(key: str) -> None:
+    """
+    Removes a setting from the cache (call after updating it).
+    Args:
+        key: Setting key.
+    """
+    with _lock:
+        _cache.pop(key, None)